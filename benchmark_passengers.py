@@ -0,0 +1,262 @@
+# Benchmark suite for the load/clean/analyze/plot pipeline of passenger_analysis.py
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import passenger_analysis as pa
+
+
+FIRST_NAMES = ['John', 'Jane', 'Mia', 'Noah', 'Liam', 'Emma', 'Olivia', 'Lucas', 'Sofia', 'Mateo', 'Isabella', 'Oliver']
+LAST_NAMES = ['Doe', 'Smith', 'Wong', 'Johnson', 'Rossi', 'Martinez', 'Hill', 'Campbell', 'Garcia', 'Kim', 'Brown', 'Silva']
+TRAVEL_CLASSES = ['FIRST_CLASS', 'BUSINESS', 'ECONOMY']
+CARRIERS = ['AA', 'BA', 'UA', 'LA']
+
+# Files larger than this are only benchmarked through the streaming stages
+MAX_IN_MEMORY_ROWS = 10_000_000
+
+
+# Synthetic Manifest Generator
+def _skewed_weights(n, skew):
+    """
+    Zipf-like weights for n categories: skew=0 gives a uniform distribution, larger values concentrate on the first ones.
+
+    :param n: int, number of categories
+    :param skew: float, exponent of the rank
+    :return: numpy array of probabilities
+    """
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+def generate_manifest(file_path, n_rows, n_flights=100, n_classes=3, loyalty_rate=0.5,
+                      flight_skew=1.0, class_skew=0.0, chunk_rows=1_000_000, seed=0):
+    """
+    Write a synthetic manifest in the same raw format as passengers.csv (row count header line,
+    M/D/YYYY birthdates, TRUE/FALSE loyalty flags), chunk by chunk so any size fits in memory.
+
+    :param file_path: str, path of the CSV file to write
+    :param n_rows: int, number of passengers
+    :param n_flights: int, number of distinct flight numbers
+    :param n_classes: int, number of travel classes (the three real classes, then 'FARE_004', 'FARE_005', ...)
+    :param loyalty_rate: float, share of loyalty program members
+    :param flight_skew: float, skew of passengers across flights (0 for uniform)
+    :param class_skew: float, skew of passengers across travel classes (0 for uniform)
+    :param chunk_rows: int, number of rows generated and written at a time
+    :param seed: int, random seed so runs are reproducible
+    :return: str, path of the CSV file
+    """
+    rng = np.random.default_rng(seed)
+    travel_classes = np.array((TRAVEL_CLASSES + [f'FARE_{i:03d}' for i in range(4, n_classes + 1)])[:n_classes])
+    flights = np.array([f'{CARRIERS[i % len(CARRIERS)]}{100 + i}' for i in range(n_flights)])
+    names = np.array([f'{first} {last}' for first in FIRST_NAMES for last in LAST_NAMES])
+    flight_weights = _skewed_weights(n_flights, flight_skew)
+    class_weights = _skewed_weights(n_classes, class_skew)
+
+    with open(file_path, 'w') as file:
+        file.write(f'{n_rows}\n')
+        for start in range(0, n_rows, chunk_rows):
+            size = min(chunk_rows, n_rows - start)
+            months = rng.integers(1, 13, size)
+            days = rng.integers(1, 29, size)
+            years = rng.integers(1940, 2010, size)
+            chunk = pd.DataFrame({
+                'PassengerID': np.arange(start + 1, start + size + 1),
+                'Name': names[rng.integers(0, len(names), size)],
+                'Birthdate': pd.Series(months).astype(str) + '/' + pd.Series(days).astype(str) + '/' + pd.Series(years).astype(str),
+                'TravelClass': travel_classes[rng.choice(n_classes, size, p=class_weights)],
+                'LoyaltyMember': np.where(rng.random(size) < loyalty_rate, 'TRUE', 'FALSE'),
+                'FlightNumber': flights[rng.choice(n_flights, size, p=flight_weights)],
+            })
+            chunk.to_csv(file, header=False, index=False)
+    return file_path
+
+
+# Pipeline Stages
+def _stages(file_path, n_rows, chunksize):
+    """
+    List the benchmarked pipeline stages for a manifest. Each stage takes the results of the earlier stages.
+
+    :param file_path: str, path of the manifest
+    :param n_rows: int, number of passengers in the manifest
+    :param chunksize: int, chunk size of the streaming stage
+    :return: list of (stage name, function(results) -> result) tuples
+    """
+    stages = [
+        ('stream_summary', lambda results: pa.summarize_chunks(pa.iter_clean_data(file_path, chunksize))),
+    ]
+    if n_rows <= MAX_IN_MEMORY_ROWS:
+        stages += [
+            ('load_data', lambda results: pa.load_data(file_path)),
+            ('clean_data', lambda results: pa.clean_data(results['load_data'])),
+            ('get_class_statistics', lambda results: pa.get_class_statistics(results['clean_data'])),
+            ('find_loyalty_members', lambda results: pa.find_loyalty_members(results['clean_data'])),
+            ('class_flight_pivot', lambda results: pa.class_flight_pivot(results['clean_data'])),
+            ('plot_class_age_heatmap', lambda results: pa.plot_class_age_heatmap(results['clean_data'], show=False, as_bytes=True)),
+            ('plot_class_flight_heatmap', lambda results: pa.plot_class_flight_heatmap(results['clean_data'], show=False, as_bytes=True)),
+        ]
+    return stages
+
+def _rows_of(result):
+    """
+    Number of rows in a stage result, when it has any.
+    """
+    return len(result) if isinstance(result, (pd.DataFrame, list, dict)) else None
+
+def benchmark_manifest(file_path, n_rows, repeat=3, profile_memory=True, chunksize=100_000):
+    """
+    Time every pipeline stage on a manifest and, optionally, measure its peak memory.
+
+    Timings are the best of repeat runs without tracing; the peak memory comes from one extra run under
+    tracemalloc, so tracing does not distort the timings.
+
+    :param file_path: str, path of the manifest
+    :param n_rows: int, number of passengers in the manifest
+    :param repeat: int, number of timed runs per stage
+    :param profile_memory: bool, whether to measure the peak memory of each stage
+    :param chunksize: int, chunk size of the streaming stage
+    :return: list of dicts, one record per stage
+    """
+    records = []
+    results = {}
+    for stage, function in _stages(file_path, n_rows, chunksize):
+        wall_times, cpu_times = [], []
+        for _ in range(repeat):
+            # Forget the memoized ages so every run pays for them, as a fresh pipeline run would
+            pa._AGE_CACHE.clear()
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            results[stage] = function(results)
+            wall_times.append(time.perf_counter() - wall_start)
+            cpu_times.append(time.process_time() - cpu_start)
+
+        peak_memory = None
+        if profile_memory:
+            pa._AGE_CACHE.clear()
+            tracemalloc.start()
+            function(results)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        records.append({
+            'stage': stage,
+            'rows': n_rows,
+            'result_rows': _rows_of(results[stage]),
+            'wall_seconds': min(wall_times),
+            'cpu_seconds': min(cpu_times),
+            'peak_memory_bytes': peak_memory,
+        })
+    return records
+
+def _environment():
+    """
+    Describe the code version and machine the benchmark ran on, so results from different versions can be compared.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+def run_benchmarks(sizes, output_path=None, repeat=3, profile_memory=True, **manifest_options):
+    """
+    Generate a manifest for every size, benchmark the pipeline on it and optionally save the results as JSON.
+
+    :param sizes: iterable of int, numbers of passengers
+    :param output_path: str, optional path of the JSON results file
+    :param repeat: int, number of timed runs per stage
+    :param profile_memory: bool, whether to measure the peak memory of each stage
+    :param manifest_options: extra keyword arguments for generate_manifest (skews, loyalty rate, ...)
+    :return: dict with the environment, the manifest options and the stage records
+    """
+    records = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_rows in sizes:
+            file_path = generate_manifest(os.path.join(tmp_dir, f'manifest_{n_rows}.csv'), n_rows, **manifest_options)
+            for record in benchmark_manifest(file_path, n_rows, repeat, profile_memory):
+                records.append(record)
+                print(f"{record['rows']:>12,} rows  {record['stage']:<26} {record['wall_seconds']:9.4f} s"
+                      + (f"  {record['peak_memory_bytes'] / 2**20:9.1f} MiB" if record['peak_memory_bytes'] is not None else ''))
+            os.remove(file_path)
+
+    results = {'environment': _environment(), 'manifest_options': manifest_options, 'records': records}
+    if output_path:
+        with open(output_path, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"Benchmark results saved to '{output_path}'")
+    return results
+
+def compare_results(baseline_path, current_path, threshold=0.10):
+    """
+    Compare two saved benchmark results and report the stages that got slower or used more memory.
+
+    :param baseline_path: str, JSON results of the reference version
+    :param current_path: str, JSON results of the version under test
+    :param threshold: float, relative increase reported as a regression (0.10 = 10%)
+    :return: list of dicts, one per regression
+    """
+    with open(baseline_path) as file:
+        baseline = {(r['stage'], r['rows']): r for r in json.load(file)['records']}
+    with open(current_path) as file:
+        current = json.load(file)['records']
+
+    regressions = []
+    for record in current:
+        reference = baseline.get((record['stage'], record['rows']))
+        if reference is None:
+            continue
+        for metric in ['wall_seconds', 'peak_memory_bytes']:
+            before, after = reference.get(metric), record.get(metric)
+            if before and after and after > before * (1 + threshold):
+                regressions.append({'stage': record['stage'], 'rows': record['rows'], 'metric': metric,
+                                    'baseline': before, 'current': after, 'change': after / before - 1})
+
+    for regression in regressions:
+        print(f"REGRESSION {regression['stage']} ({regression['rows']:,} rows) {regression['metric']}: "
+              f"{regression['baseline']:.4g} -> {regression['current']:.4g} (+{regression['change']:.0%})")
+    if not regressions:
+        print("No regressions found.")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the passenger analysis pipeline on synthetic manifests.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help='manifest sizes to benchmark (10^3 to 10^8 rows)')
+    parser.add_argument('--flights', type=int, default=100, help='number of distinct flights')
+    parser.add_argument('--classes', type=int, default=3, help='number of travel classes')
+    parser.add_argument('--loyalty-rate', type=float, default=0.5, help='share of loyalty members')
+    parser.add_argument('--flight-skew', type=float, default=1.0, help='skew of passengers across flights (0 = uniform)')
+    parser.add_argument('--class-skew', type=float, default=0.0, help='skew of passengers across classes (0 = uniform)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory measurement')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file for the results')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='compare two saved result files instead of running the benchmarks')
+    parser.add_argument('--threshold', type=float, default=0.10, help='relative increase reported as a regression')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare_results(*args.compare, threshold=args.threshold) else 0
+    run_benchmarks(args.rows, args.output, repeat=args.repeat, profile_memory=not args.no_memory,
+                   n_flights=args.flights, n_classes=args.classes, loyalty_rate=args.loyalty_rate,
+                   flight_skew=args.flight_skew, class_skew=args.class_skew)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,5 +1,9 @@
 # inspect_csv.py
-file_path = '/Users/josemarchena/Python/Project1_marchenajose/cleaned_passengers.csv'
+import os
+import sys
+
+# Inspect the file given on the command line, or cleaned_passengers.csv next to this script
+file_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cleaned_passengers.csv')
 
 # Read the file content as raw text
 with open(file_path, 'r') as file:
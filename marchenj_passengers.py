@@ -1,113 +1,169 @@
 # 3.3: Import this module into your main script and call the functions as needed.
 
+import argparse
+import json
+import os
+import sys
+from datetime import date
 import pandas as pd
-from passenger_analysis import load_data, clean_data, calculate_average_age, find_loyalty_members, get_class_statistics, plot_age_distribution, plot_average_age_by_class, plot_age_vs_loyalty, plot_age_distribution_by_class, plot_travel_class_distribution, plot_loyalty_members_by_class, plot_correlation_heatmap, plot_class_age_heatmap, plot_class_flight_heatmap
+from passenger_analysis import load_data, clean_data, load_cached_data, load_many, summarize_many, find_manifest_files, calculate_average_age, get_class_statistics, render_charts, cached_call, enable_instrumentation, CHARTS, CLASS_METRICS, OUTPUT_DIR
+from passenger_cache import ResultCache
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+STAGES = ['clean', 'stats', 'charts']
+DEFAULT_METRICS = ['Average Age', 'Loyalty Members']
+
+
+def parse_args(argv=None):
+    """
+    Parse the command line.
+
+    :param argv: list of str, arguments (defaults to sys.argv[1:])
+    :return: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(description='Clean passenger manifests, compute class statistics and render charts.')
+    parser.add_argument('inputs', nargs='*', default=[os.path.join(PROJECT_DIR, 'passengers.csv')],
+                        help='manifest CSV files, directories or glob patterns (defaults to passengers.csv next to this script)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, metavar='STAGE',
+                        help='stages to run: clean (write cleaned_passengers.csv), stats, charts (default: all, or stats with --stream)')
+    parser.add_argument('--charts', nargs='+', choices=list(CHARTS), metavar='CHART',
+                        help=f"charts to render (default: all): {', '.join(CHARTS)}")
+    parser.add_argument('--metrics', nargs='+', choices=list(CLASS_METRICS), default=DEFAULT_METRICS, metavar='METRIC',
+                        help=f"per-class metrics of the stats stage (default: Average Age, Loyalty Members): {', '.join(CLASS_METRICS)}")
+    parser.add_argument('--travel-class', default='ECONOMY', help='travel class whose average age is reported')
+    parser.add_argument('--format', choices=['text', 'json', 'csv'], default='text', help='output format of the statistics')
+    parser.add_argument('--output', help='file for the statistics (default: standard output)')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='directory for the charts and the cleaned CSV')
+    parser.add_argument('--reference-date', type=date.fromisoformat, help='date the ages are computed at (YYYY-MM-DD, default: today)')
+    parser.add_argument('--processes', type=int, help='worker processes for multiple files and charts (default: CPU count)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='always parse the CSV and recompute every result instead of reusing the .cache.npz copy and the result cache')
+    parser.add_argument('--result-cache', metavar='DIR',
+                        help='directory of the cached statistics and charts (default: .result_cache in the output directory)')
+    parser.add_argument('--result-cache-size', type=float, default=256, metavar='MB',
+                        help='size limit of the result cache in megabytes; the least recently used results are evicted beyond it (default: 256)')
+    parser.add_argument('--stream', action='store_true',
+                        help='compute the statistics chunk by chunk without keeping the passengers in memory (stats stage only)')
+    parser.add_argument('--stage-log', default=os.environ.get('PASSENGER_STAGE_LOG'),
+                        help='JSON lines file recording the time, memory and row count of every stage (default: $PASSENGER_STAGE_LOG)')
+    args = parser.parse_args(argv)
+
+    args.stages = args.stages or (['stats'] if args.stream else STAGES)
+    args.file_paths = find_manifest_files(args.inputs)
+    if not args.file_paths:
+        parser.error(f"no manifest files found for {' '.join(args.inputs)}")
+    if args.stream and (set(args.stages) != {'stats'} or set(args.metrics) != set(DEFAULT_METRICS)):
+        parser.error('--stream only supports --stages stats with the default metrics')
+    return args
+
+def load_passengers(file_paths, use_cache=True, processes=None):
+    """
+    Load and clean the manifests, reusing the binary cache for a single file.
+
+    :param file_paths: list of str, manifest CSV files
+    :param use_cache: bool, whether to reuse (and refresh) the .cache.npz copy of the cleaned data
+    :param processes: int, number of worker processes for multiple files
+    :return: cleaned pandas DataFrame
+    """
+    if len(file_paths) > 1:
+        return load_many(file_paths, processes)
+    if use_cache:
+        return load_cached_data(file_paths[0])
+    return clean_data(load_data(file_paths[0]))
+
+def write_statistics(statistics, output_format, output=None):
+    """
+    Write the results of the stats stage as text, JSON or CSV.
+
+    :param statistics: dict with 'class_statistics', 'loyalty_member_count' and 'average_age'
+    :param output_format: str, 'text', 'json' or 'csv' (CSV holds the per-class table only)
+    :param output: str, optional file path (defaults to standard output)
+    """
+    if output_format == 'json':
+        text = json.dumps(statistics, indent=2, default=float) + '\n'
+    elif output_format == 'csv':
+        class_table = pd.DataFrame.from_dict(statistics['class_statistics'], orient='index').rename_axis('TravelClass')
+        text = class_table.to_csv()
+    else:
+        average_age = statistics['average_age']
+        text = (f"Average age of {average_age['travel_class']} class passengers: {average_age['value']}\n"
+                f"Loyalty Members: {statistics['loyalty_member_count']}\n"
+                f"Class Statistics: {statistics['class_statistics']}\n")
+
+    if output:
+        with open(output, 'w') as file:
+            file.write(text)
+    else:
+        sys.stdout.write(text)
 
 # Main Execution
-
-# File path to the original CSV file
-file_path = '/Users/josemarchena/Python/Project1_marchenajose/passengers.csv'
-
-# Task 1: Data Loadong Cleaning 
-
-# Load the dataset
-df = load_data(file_path)
-
-print('\nTask 1: Data Loadong Cleaning ')
-# Display the first few rows to inspect column names
-print("\nOriginal Data:")
-print(df.head())
-
-# Print column names to debug
-print("Column names:", df.columns)
-
-# Clean the dataset
-cleaned_df = clean_data(df)
-
-print("\nCleaned Data:")
-print(cleaned_df.head())
-
-# Try to use ace_tools to display the cleaned dataset
-try:
-   import ace_tools as tools
-   tools.display_dataframe_to_user(name="Cleaned Passenger Data", dataframe=cleaned_df)
-except ImportError:
-   # If ace_tools is not available, fall back to displaying the data using pandas
-   print("ace_tools is not available. Displaying cleaned data using pandas:")
-   print(cleaned_df)
-   # Optionally, save the cleaned data to a CSV file
-   cleaned_df.to_csv('/Users/josemarchena/Python/Project1_marchenajose/cleaned_passengers.csv', index=False)
-   print("Cleaned data saved to 'cleaned_passengers.csv'")
-
-
-# File path to the cleaned CSV file
-cleaned_file_path = '/Users/josemarchena/Python/Project1_marchenajose/cleaned_passengers.csv'
-
-# Load the cleaned dataset
-cleaned_df = pd.read_csv(cleaned_file_path, parse_dates=['Birthdate'])
-
-# Task 2: Decision Making and Loops
-
-# Call the fn for the task 2.1
-print("\nTask 2.1: Calculate the average age for a specific travel class")
-average_age_economy = calculate_average_age(cleaned_df, 'ECONOMY')
-print(f"Average age of ECONOMY class passengers: {average_age_economy}")
-
-# Find loyalty members
-# Call the fn for the task 2.2
-print("\nTask 2.2: Find loyalty members")
-loyalty_members = find_loyalty_members(cleaned_df)
-print(f"Loyalty Members: {loyalty_members}")
-
-# Task 3.1: Get Class Statistics
-print("\nTask 3.1: Get Class Statistics")
-class_statistics = get_class_statistics(cleaned_df)
-
-print(f"\nClass Statistics: {class_statistics}")
-
-# Task 4: Data Visualization with Matplotlib
-
-# Task 4.1: Plot Age Distribution
-print("\nTask 4.1: Plot Age Distribution")
-plot_age_distribution(cleaned_df)
-
-# Task 4.3: Plot Average Age by Class
-print("\nTask 4.3: Plot Average Age by Class")
-plot_average_age_by_class(cleaned_df)
-
-# Task 5: Data Visualization with Seaborn and Plotly
-
-# Task 5.1: Plot Age vs. Loyalty Membership
-print("\nTask 5.1: Plot Age vs. Loyalty Membership")
-plot_age_vs_loyalty(cleaned_df)
-
-# Task 5.3: Plot Age Distribution by Class
-print("\nTask 5.3: Plot Age Distribution by Class")
-plot_age_distribution_by_class(cleaned_df)
-
-#####
-
-# Task 6: Additional Visualizations
-
-# Task 6.1: Plot Travel Class Distribution as a Pie Chart
-print("\nTask 6.1: Plot Travel Class Distribution as a Pie Chart")
-plot_travel_class_distribution(cleaned_df)
-
-# Task 6.2: Plot Number of Loyalty Members by Travel Class
-print("\nTask 6.2: Plot Number of Loyalty Members by Travel Class")
-plot_loyalty_members_by_class(cleaned_df)
-
-# Task 7: Heatmap Visualizations
-
-# Option 1: Correlation Heatmap
-print("\nTask 7.1: Plot Correlation Heatmap")
-plot_correlation_heatmap(cleaned_df)
-
-# Option 2: Travel Class vs. Age Heatmap
-print("\nTask 7.2: Plot Travel Class vs. Age Heatmap")
-plot_class_age_heatmap(cleaned_df)
-
-# Option 3: Travel Class vs. Flight Number Heatmap
-print("\nTask 7.3: Plot Travel Class vs. Flight Number Heatmap")
-plot_class_flight_heatmap(cleaned_df)
-
+def main(argv=None):
+    args = parse_args(argv)
+    # Progress messages go to standard error when the statistics are written to standard output as JSON or CSV
+    log = print if args.format == 'text' or args.output else lambda *values: print(*values, file=sys.stderr)
+
+    # Record the time, memory and row count of every stage as JSON lines when a stage log is given
+    if args.stage_log:
+        enable_instrumentation(jsonl_path=args.stage_log, trace_memory=os.environ.get('PASSENGER_TRACE_MEMORY') == '1')
+
+    # Streaming statistics: one pass over the files in chunks, without building the cleaned DataFrame
+    if args.stream:
+        class_statistics, loyalty_count, _ = summarize_many(args.file_paths, args.processes, args.reference_date)
+        average_age = class_statistics.get(args.travel_class, {}).get('Average Age')
+        write_statistics({'class_statistics': class_statistics, 'loyalty_member_count': loyalty_count,
+                          'average_age': {'travel_class': args.travel_class, 'value': average_age}},
+                         args.format, args.output)
+        return 0
+
+    # Task 1: Data Loadong Cleaning
+    # Load and clean the dataset, reusing the binary cache of the cleaned data when the CSV has not changed
+    cleaned_df = load_passengers(args.file_paths, use_cache=not args.no_cache, processes=args.processes)
+    # Statistics and charts already computed from the same data, parameters and reference date are reused
+    result_cache = None
+    if not args.no_cache:
+        result_cache = ResultCache(args.result_cache or os.path.join(args.output_dir, '.result_cache'),
+                                   max_bytes=int(args.result_cache_size * 2 ** 20))
+
+    if 'clean' in args.stages:
+        log('\nTask 1: Data Loadong Cleaning ')
+        log(f"\nCleaned Data ({len(cleaned_df)} passengers):")
+        log(cleaned_df.head())
+
+        # Try to use ace_tools to display the cleaned dataset
+        try:
+           import ace_tools as tools
+           tools.display_dataframe_to_user(name="Cleaned Passenger Data", dataframe=cleaned_df)
+        except ImportError:
+           # If ace_tools is not available, save the cleaned data to a CSV file instead
+           os.makedirs(args.output_dir, exist_ok=True)
+           cleaned_path = os.path.join(args.output_dir, 'cleaned_passengers.csv')
+           cleaned_df.to_csv(cleaned_path, index=False)
+           log(f"Cleaned data saved to '{cleaned_path}'")
+
+    if 'stats' in args.stages:
+        # Task 2: Decision Making and Loops
+        # Tasks 2.1, 2.2 and 3.1: average age of one class, loyalty members and per-class statistics
+        average_age = cached_call(result_cache, calculate_average_age, cleaned_df, travel_class=args.travel_class,
+                                  reference_date=args.reference_date)
+        loyalty_count = int(cleaned_df['LoyaltyMember'].sum())
+        class_statistics = cached_call(result_cache, get_class_statistics, cleaned_df, metrics=args.metrics,
+                                       reference_date=args.reference_date)
+        write_statistics({'class_statistics': class_statistics, 'loyalty_member_count': loyalty_count,
+                          'average_age': {'travel_class': args.travel_class, 'value': average_age}},
+                         args.format, args.output)
+
+    if 'charts' in args.stages:
+        # Tasks 4-7: Data Visualization
+        # Render the selected charts to the output directory without displaying them;
+        # the Matplotlib charts are drawn in parallel worker processes, except those found in the result cache
+        log("\nTasks 4-7: Render charts")
+        chart_paths = render_charts(cleaned_df, output_dir=args.output_dir, charts=args.charts,
+                                    processes=args.processes, reference_date=args.reference_date, cache=result_cache)
+        for chart, chart_path in chart_paths.items():
+            log(f"{chart}: {chart_path}")
+    return 0
+
+
+# The process pool used for the charts re-imports this script, so only run it when executed directly
+if __name__ == '__main__':
+    raise SystemExit(main())
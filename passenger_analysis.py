@@ -1,70 +1,1432 @@
 # Task 3.2: Write a module named passenger_analysis.py and
 
+import glob
+import hashlib
+import inspect
+import io
+import json
+import logging
+import os
+import re
+import sys
+import time
+import tracemalloc
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, wraps
+import numpy as np
 import pandas as pd
-from datetime import datetime
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
+from datetime import date, datetime
+from passenger_sketches import CountMinSketch, HistogramSketch, HyperLogLog
 
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; the peak resident memory is then left out of the stage records
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+# Instrumentation: Stage Timing and Memory Records
+# Active instrumentation settings, or None when disabled (the default): {'sinks': [...], 'trace_memory': bool}
+_INSTRUMENTATION = None
+# Memory tracking of the stages currently running, innermost last (only used with trace_memory)
+_STAGE_STACK = []
+
+def enable_instrumentation(callback=None, jsonl_path=None, trace_memory=False):
+    """
+    Start recording wall time, CPU time, memory and row counts for every instrumented pipeline stage.
+    
+    Each record is a dict with 'stage', 'started_at', 'wall_seconds', 'cpu_seconds', 'peak_memory_bytes',
+    'max_rss_bytes', 'rows_in', 'rows_out' and 'error'. Only the calling process is recorded, not worker processes.
+    
+    :param callback: callable receiving each record, optional
+    :param jsonl_path: str, optional file the records are appended to as JSON lines
+    :param trace_memory: bool, if True measure each stage's peak Python/NumPy allocations with tracemalloc
+                         (exact but slows the stages down); otherwise only the process peak RSS is recorded
+    """
+    global _INSTRUMENTATION
+    sinks = []
+    if callback is not None:
+        sinks.append(callback)
+    if jsonl_path is not None:
+        sinks.append(partial(_append_jsonl, jsonl_path))
+    _INSTRUMENTATION = {'sinks': sinks, 'trace_memory': trace_memory}
+
+def disable_instrumentation():
+    """
+    Stop recording pipeline stages.
+    """
+    global _INSTRUMENTATION
+    _INSTRUMENTATION = None
+
+def _append_jsonl(jsonl_path, record):
+    """
+    Append a stage record to a JSON lines file.
+    """
+    with open(jsonl_path, 'a') as file:
+        file.write(json.dumps(record) + '\n')
+
+def _row_count(value):
+    """
+    Number of rows of a DataFrame, Series, list or dict, or None for anything else.
+    """
+    return len(value) if isinstance(value, (pd.DataFrame, pd.Series, list, dict)) else None
+
+def _max_rss_bytes():
+    """
+    Peak resident memory of the process so far, or None where the resource module is missing.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+def instrumented(function):
+    """
+    Decorator that records a pipeline stage (named after the function) while instrumentation is enabled.
+    
+    When instrumentation is disabled the only overhead is one check of a module variable per call.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if _INSTRUMENTATION is None:
+            return function(*args, **kwargs)
+        return _run_stage(function, args, kwargs)
+    return wrapper
+
+def _run_stage(function, args, kwargs):
+    """
+    Run an instrumented function and send its stage record to the active sinks.
+    """
+    settings = _INSTRUMENTATION
+    trace_memory = settings['trace_memory']
+    if trace_memory:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        current, peak = tracemalloc.get_traced_memory()
+        if _STAGE_STACK:
+            # Keep the enclosing stage's peak before resetting it for this stage
+            _STAGE_STACK[-1]['peak'] = max(_STAGE_STACK[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        _STAGE_STACK.append({'start': current, 'peak': current, 'started_tracing': started_tracing})
+    
+    record = {
+        'stage': function.__name__,
+        'started_at': datetime.now().isoformat(timespec='milliseconds'),
+        'wall_seconds': None,
+        'cpu_seconds': None,
+        'peak_memory_bytes': None,
+        'max_rss_bytes': None,
+        'rows_in': _row_count(args[0]) if args else None,
+        'rows_out': None,
+        'error': None,
+    }
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        result = function(*args, **kwargs)
+        record['rows_out'] = _row_count(result)
+        return result
+    except Exception as error:
+        record['error'] = repr(error)
+        raise
+    finally:
+        record['wall_seconds'] = time.perf_counter() - wall_start
+        record['cpu_seconds'] = time.process_time() - cpu_start
+        if trace_memory:
+            tracking = _STAGE_STACK.pop()
+            peak = max(tracking['peak'], tracemalloc.get_traced_memory()[1])
+            record['peak_memory_bytes'] = peak - tracking['start']
+            if _STAGE_STACK:
+                _STAGE_STACK[-1]['peak'] = max(_STAGE_STACK[-1]['peak'], peak)
+            if tracking['started_tracing']:
+                tracemalloc.stop()
+        record['max_rss_bytes'] = _max_rss_bytes()
+        for sink in settings['sinks']:
+            sink(record)
+
+# Column types used when parsing a manifest: the low-cardinality text columns are stored as categorical codes,
+# which also gives parse_birthdates the distinct birthdate strings without an extra pass. PassengerID is read as
+# text so that malformed IDs ('abc', '4.5') reach the invalid_passenger_id rule instead of failing the whole load
+PASSENGER_DTYPES = {
+    'PassengerID': 'string',
+    'Name': 'string',
+    'Birthdate': 'category',
+    'TravelClass': 'category',
+    'LoyaltyMember': 'category',
+    'FlightNumber': 'category',
+}
+
+# Travel date in the name of a daily manifest file, e.g. 'manifests/2024-03-05.csv' or 'flights_20240305.csv'
+TRAVEL_DATE_PATTERN = re.compile(r'(\d{4})-?(\d{2})-?(\d{2})')
+
+def travel_date_from_path(file_path):
+    """
+    Get the travel date of a daily manifest from its file name (YYYY-MM-DD or YYYYMMDD).
+    
+    :param file_path: str, path to the CSV file
+    :return: datetime.date
+    """
+    match = TRAVEL_DATE_PATTERN.search(os.path.basename(file_path))
+    if match is None:
+        raise ValueError(f"No travel date (YYYY-MM-DD or YYYYMMDD) in the file name {file_path!r}")
+    return date(*map(int, match.groups()))
 
 # Task 1.1: Load the Data
-def load_data(file_path):
+@instrumented
+def load_data(file_path, chunksize=None, travel_date=None):
     """
-    Load the CSV file into a pandas DataFrame with explicit column names.
+    Load the CSV file into a pandas DataFrame with explicit column names and compact column types.
     
     :param file_path: str, path to the CSV file
-    :return: pandas DataFrame
+    :param chunksize: int, optional number of rows per chunk; when given, the file is read lazily
+    :param travel_date: datetime.date of the flights in the file, or 'auto' to take it from the file name
+                        (see travel_date_from_path); when given, a 'TravelDate' column is added for the date-partitioned mode
+    :return: pandas DataFrame, or an iterator of DataFrames of at most chunksize rows if chunksize is set
     """
-    column_names = ['PassengerID', 'Name', 'Birthdate', 'TravelClass', 'LoyaltyMember', 'FlightNumber']
-    return pd.read_csv(file_path, names=column_names, header=0)
+    column_names = list(PASSENGER_DTYPES)
+    data = pd.read_csv(file_path, names=column_names, header=0, dtype=PASSENGER_DTYPES, chunksize=chunksize)
+    if travel_date is None:
+        return data
+    
+    travel_date = pd.Timestamp(travel_date_from_path(file_path) if travel_date == 'auto' else travel_date)
+    if chunksize is None:
+        return data.assign(TravelDate=travel_date)
+    return (chunk.assign(TravelDate=travel_date) for chunk in data)
+
+def _loyalty_flags(loyalty):
+    """
+    Convert a loyalty column to booleans, treating any spelling of 'TRUE' as a member.
+    
+    Categorical columns are converted through their categories, so the string comparison runs once per distinct value.
+    
+    :param loyalty: pandas Series of booleans, strings or categories
+    :return: pandas Series of bool
+    """
+    if pd.api.types.is_bool_dtype(loyalty):
+        return loyalty.astype(bool)
+    if isinstance(loyalty.dtype, pd.CategoricalDtype):
+        is_member = loyalty.cat.categories.astype(str).str.upper() == 'TRUE'
+        return pd.Series(is_member[loyalty.cat.codes], index=loyalty.index) & (loyalty.cat.codes >= 0)
+    return loyalty.astype(str).str.upper() == 'TRUE'
+
+# Birthdate formats tried, in order, when the format is detected from the data
+BIRTHDATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d', '%d.%m.%Y', '%Y/%m/%d', '%d-%m-%Y', '%m-%d-%Y']
+
+def detect_date_format(values, sample_size=1000):
+    """
+    Detect the format of date strings from a sample of their distinct values.
+    
+    :param values: pandas Series of date strings
+    :param sample_size: int, maximum number of distinct values checked
+    :return: str, the format from BIRTHDATE_FORMATS parsing the most values, or None if none parses any
+    """
+    sample = pd.Series(pd.unique(values.dropna())[:sample_size], dtype=object)
+    best_format, best_count = None, 0
+    for date_format in BIRTHDATE_FORMATS:
+        parsed_count = pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum()
+        if parsed_count > best_count:
+            best_format, best_count = date_format, parsed_count
+        if parsed_count == len(sample):
+            break
+    return best_format
+
+def parse_birthdates(values, date_format=None):
+    """
+    Parse date strings with a fixed format, converting each distinct string only once.
+    
+    Birthdates repeat heavily, so only the distinct strings are parsed: the categories of a categorical Series
+    (as produced by load_data), or the distinct values found by factorizing any other Series.
+    
+    :param values: pandas Series of date strings (datetime Series are returned unchanged)
+    :param date_format: str, strftime-style format; detected once from the data when None
+    :return: pandas Series of datetimes aligned with values, NaT where a string could not be parsed
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    if len(uniques) == 0:
+        return pd.Series(np.full(len(values), np.datetime64('NaT', 'ns')), index=values.index, name=values.name)
+    if date_format is None:
+        date_format = detect_date_format(pd.Series(uniques))
+    
+    # Without a recognised format, fall back to letting pandas infer it
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=date_format, errors='coerce').to_numpy()
+    birthdates = parsed[codes]
+    birthdates[codes < 0] = np.datetime64('NaT')
+    return pd.Series(birthdates, index=values.index, name=values.name)
+
+# Data Validation: Vectorized Rules with a Quarantine of the Rejected Rows
+# Accepted values of the validation rules; the class rule is opt-in since fare classes vary by feed
+# (pass travel_classes=None to clean_data to accept only the bundled classes)
+TRAVEL_CLASSES = ['FIRST_CLASS', 'BUSINESS', 'ECONOMY']
+FLIGHT_NUMBER_PATTERN = r'[A-Z0-9]{2}\d{1,4}[A-Z]?'  # airline designator, 1 to 4 digits, optional suffix
+EARLIEST_BIRTHDATE = pd.Timestamp('1900-01-01')
+LOYALTY_FLAGS = ['TRUE', 'FALSE']
+
+# Validation rules, in the order they are checked: rule name -> description used in the rejection summary
+VALIDATION_RULES = {
+    'missing_value': 'a column is empty',
+    'invalid_passenger_id': 'PassengerID is not a positive integer',
+    'duplicate_passenger_id': 'PassengerID already used by an earlier row',
+    'unparseable_birthdate': 'Birthdate does not match the date format',
+    'birthdate_out_of_range': f'Birthdate before {EARLIEST_BIRTHDATE.date()} or in the future',
+    'unknown_travel_class': 'TravelClass is not one of the accepted travel classes',
+    'invalid_flight_number': 'FlightNumber does not match FLIGHT_NUMBER_PATTERN',
+    'invalid_loyalty_flag': 'LoyaltyMember is not TRUE or FALSE',
+}
+
+def _distinct_value_mask(values, predicate):
+    """
+    Evaluate a vectorized predicate once per distinct value and spread the result to every row.
+    
+    :param values: pandas Series, categorical or not
+    :param predicate: callable taking a pandas Series of the distinct values and returning booleans
+    :return: numpy array of bool aligned with values, False for missing values
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    if len(uniques) == 0:
+        return np.zeros(len(values), dtype=bool)
+    distinct_mask = np.asarray(predicate(pd.Series(uniques, dtype=object)), dtype=bool)
+    return distinct_mask[codes] & (codes >= 0)
+
+def _check_rules(df, date_format=None, travel_classes=None):
+    """
+    Check every validation rule on every row with column-wise operations.
+    
+    :param df: pandas DataFrame with the manifest columns
+    :param date_format: str, format of the 'Birthdate' strings; detected from the data when None
+    :param travel_classes: list of accepted travel classes, or None (default) to accept any
+    :return: tuple (dict of rule name -> numpy array of bool marking the rows failing it, in VALIDATION_RULES order,
+             dict of the converted 'PassengerID', 'Birthdate' and 'LoyaltyMember' Series)
+    """
+    present = {column: df[column].notna().to_numpy() for column in PASSENGER_DTYPES}
+    no_failures = np.zeros(len(df), dtype=bool)
+    
+    passenger_ids = pd.to_numeric(df['PassengerID'], errors='coerce')
+    valid_ids = passenger_ids > 0
+    if not pd.api.types.is_integer_dtype(passenger_ids):
+        valid_ids &= passenger_ids % 1 == 0
+    
+    birthdates = parse_birthdates(df['Birthdate'], date_format)
+    birthdate_values = birthdates.to_numpy()
+    
+    loyalty = df['LoyaltyMember']
+    if pd.api.types.is_bool_dtype(loyalty):
+        invalid_loyalty = no_failures
+    else:
+        invalid_loyalty = present['LoyaltyMember'] & ~_distinct_value_mask(
+            loyalty, lambda flags: flags.astype(str).str.strip().str.upper().isin(LOYALTY_FLAGS))
+    if travel_classes is None:
+        unknown_class = no_failures
+    else:
+        unknown_class = present['TravelClass'] & ~_distinct_value_mask(
+            df['TravelClass'], lambda classes: classes.isin(travel_classes))
+    
+    failures = {
+        'missing_value': ~np.logical_and.reduce(list(present.values())),
+        'invalid_passenger_id': present['PassengerID'] & ~valid_ids.fillna(False).to_numpy(dtype=bool),
+        'duplicate_passenger_id': (passenger_ids.notna() & passenger_ids.duplicated(keep='first')).to_numpy(),
+        'unparseable_birthdate': present['Birthdate'] & np.isnat(birthdate_values),
+        'birthdate_out_of_range': (birthdate_values < EARLIEST_BIRTHDATE.to_datetime64())
+                                  | (birthdate_values > pd.Timestamp.today().to_datetime64()),
+        'unknown_travel_class': unknown_class,
+        'invalid_flight_number': present['FlightNumber'] & ~_distinct_value_mask(
+            df['FlightNumber'], lambda flights: flights.astype(str).str.fullmatch(FLIGHT_NUMBER_PATTERN)),
+        'invalid_loyalty_flag': invalid_loyalty,
+    }
+    converted = {'PassengerID': passenger_ids, 'Birthdate': birthdates, 'LoyaltyMember': _loyalty_flags(loyalty)}
+    return failures, converted
+
+def _quarantine(df, failures, rejected):
+    """
+    Select the rejected rows and name the rules each of them failed.
+    
+    :param df: pandas DataFrame that was validated
+    :param failures: dict of rule name -> numpy array of bool (see _check_rules)
+    :param rejected: numpy array of bool, rows failing at least one rule
+    :return: pandas DataFrame of the rejected rows with a 'RejectedRules' column such as 'missing_value;duplicate_passenger_id'
+    """
+    rejected_rules = np.full(rejected.sum(), '', dtype=object)
+    for rule, failed in failures.items():
+        rejected_rules += np.where(failed[rejected], rule + ';', '')
+    return df[rejected].assign(RejectedRules=pd.Series(rejected_rules, index=df.index[rejected]).str.rstrip(';'))
+
+def _rejection_summary(failures):
+    """
+    Count the rows failing each rule (a row failing several rules is counted under each of them).
+    
+    :param failures: dict of rule name -> numpy array of bool (see _check_rules)
+    :return: pandas DataFrame indexed by rule with 'Rows' and 'Description' columns
+    """
+    rows = pd.Series({rule: int(failed.sum()) for rule, failed in failures.items()})
+    return pd.DataFrame({'Rows': rows, 'Description': pd.Series(VALIDATION_RULES)}).rename_axis('Rule')
+
+@instrumented
+def validate_passengers(df, date_format=None, travel_classes=None):
+    """
+    Validate a raw manifest and report what cleaning would reject, without changing the data.
+    
+    :param df: pandas DataFrame with the manifest columns (e.g. from load_data)
+    :param date_format: str, format of the 'Birthdate' strings; detected from the data when None
+    :param travel_classes: list of accepted travel classes, or None (default) to accept any
+    :return: tuple (rejection summary DataFrame indexed by rule with 'Rows' and 'Description' columns,
+             quarantine DataFrame of the rejected rows with a 'RejectedRules' column)
+    """
+    failures, _ = _check_rules(df, date_format, travel_classes)
+    rejected = np.logical_or.reduce(list(failures.values()))
+    return _rejection_summary(failures), _quarantine(df, failures, rejected)
+
+def _as_category(values, rows_removed=True):
+    """
+    Convert a column to categorical, dropping the categories that no longer occur once rows were removed.
+    
+    :param values: pandas Series
+    :param rows_removed: bool, whether rows were filtered out, possibly leaving unused categories
+    :return: categorical pandas Series
+    """
+    values = values.astype('category')
+    return values.cat.remove_unused_categories() if rows_removed else values
 
 # Task 1.2: Clean the Data (Checks for and handles any missing values and ensures data types are appropriate for analysis)
-def clean_data(df):
+@instrumented
+def clean_data(df, date_format=None, return_rejected=False, travel_classes=None):
     """
-    Clean the DataFrame by handling missing values and ensuring appropriate data types.
+    Clean the DataFrame by validating every row and ensuring appropriate data types.
+    
+    The rows failing any rule of VALIDATION_RULES (missing values, invalid or duplicate passenger IDs, unparseable
+    or out-of-range birthdates, unknown travel classes, malformed flight numbers, unknown loyalty flags) are
+    quarantined instead of cleaned, and a summary of the rejections is logged. The input DataFrame is not modified.
     
     :param df: pandas DataFrame
+    :param date_format: str, format of the 'Birthdate' strings (e.g. '%m/%d/%Y'); detected from the data when None
+    :param return_rejected: bool, if True also return the quarantined rows with a 'RejectedRules' column
+    :param travel_classes: list of accepted travel classes, or None (default) to accept any
+    :return: cleaned pandas DataFrame, or a tuple (cleaned DataFrame, quarantined rows) if return_rejected is set
+    """
+    # Check all rules column by column, converting the IDs, birthdates and loyalty flags once on the way
+    failures, converted = _check_rules(df, date_format, travel_classes)
+    rejected = np.logical_or.reduce(list(failures.values()))
+    if rejected.any():
+        rule_counts = _rejection_summary(failures)['Rows']
+        logger.warning("Quarantined %d of %d row(s): %s", rejected.sum(), len(df),
+                       ', '.join(f'{rule}={count}' for rule, count in rule_counts[rule_counts > 0].items()))
+    
+    # Build the cleaned columns on the accepted rows as a new DataFrame, leaving the input untouched
+    accepted = ~rejected
+    birthdates = converted['Birthdate'][accepted]
+    cleaned_df = df[accepted].assign(
+        PassengerID=converted['PassengerID'][accepted].astype('int64'),
+        Birthdate=birthdates,
+        LoyaltyMember=converted['LoyaltyMember'][accepted],
+        # Store the repeated text columns as categorical codes and keep a compact birth year for age calculations
+        TravelClass=_as_category(df['TravelClass'][accepted], rejected.any()),
+        FlightNumber=_as_category(df['FlightNumber'][accepted], rejected.any()),
+        BirthYear=birthdates.dt.year.astype('int16'),
+    )
+    
+    if return_rejected:
+        return cleaned_df, _quarantine(df, failures, rejected)
+    return cleaned_df
+
+# Streaming: Load and Clean the Data in Chunks
+def iter_clean_data(file_path, chunksize=100_000, date_format=None, travel_classes=None, travel_date=None):
+    """
+    Load and clean the CSV file one chunk at a time so peak memory does not grow with the file size.
+    
+    Duplicate passenger IDs are only detected within a chunk.
+    
+    :param file_path: str, path to the CSV file
+    :param chunksize: int, maximum number of rows per chunk
+    :param date_format: str, format of the 'Birthdate' strings; detected once from the first chunk when None
+    :param travel_classes: list of accepted travel classes, or None (default) to accept any
+    :param travel_date: datetime.date of the flights in the file, or 'auto' to take it from the file name (see load_data)
+    :return: generator of cleaned pandas DataFrames
+    """
+    for chunk in load_data(file_path, chunksize=chunksize, travel_date=travel_date):
+        if date_format is None:
+            date_format = detect_date_format(chunk['Birthdate'])
+        yield clean_data(chunk, date_format, travel_classes=travel_classes)
+
+# Cached Loading: Store the Cleaned Data in a Binary Sidecar File
+# Version of the cleaned data in the cache; bump it whenever the cleaning rules or the file layout change,
+# so that caches written by an earlier version are rebuilt instead of served
+CACHE_VERSION = 2
+
+def _file_fingerprint(file_path):
+    """
+    Compute the SHA-256 hash of a file, reading it in blocks.
+    
+    :param file_path: str, path to the file
+    :return: str, hexadecimal digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _save_frame_npz(df, cache_path, source_key):
+    """
+    Save a cleaned DataFrame column by column into a NumPy .npz file.
+    
+    Categorical columns are stored as codes plus categories and text columns as fixed-width unicode arrays,
+    so the file can be read back without pickling.
+    
+    :param df: cleaned pandas DataFrame
+    :param cache_path: str, path of the .npz file to write
+    :param source_key: dict, size, mtime and hash of the source file
+    """
+    arrays = {'__index__': df.index.to_numpy()}
+    kinds = {}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            kinds[column] = 'category'
+            arrays[f'{column}.codes'] = values.cat.codes.to_numpy()
+            arrays[f'{column}.categories'] = np.asarray(values.cat.categories.astype(str), dtype=str)
+        elif pd.api.types.is_string_dtype(values.dtype) or values.dtype == object:
+            kinds[column] = 'string'
+            arrays[column] = np.asarray(values.astype(str), dtype=str)
+        else:
+            kinds[column] = 'numpy'
+            arrays[column] = values.to_numpy()
+    arrays['__meta__'] = np.array(json.dumps({'version': CACHE_VERSION, 'source': source_key, 'columns': kinds}))
+    
+    # Write to a temporary file first so a crash never leaves a half-written cache behind
+    tmp_path = f'{cache_path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(tmp_path, cache_path)
+
+def _load_frame_npz(cache):
+    """
+    Rebuild a DataFrame from an open .npz file written by _save_frame_npz.
+    
+    :param cache: numpy NpzFile
+    :return: pandas DataFrame
+    """
+    meta = json.loads(cache['__meta__'].item())
+    columns = {}
+    for column, kind in meta['columns'].items():
+        if kind == 'category':
+            columns[column] = pd.Categorical.from_codes(cache[f'{column}.codes'], categories=cache[f'{column}.categories'])
+        elif kind == 'string':
+            columns[column] = pd.array(cache[column], dtype='string')
+        else:
+            columns[column] = cache[column]
+    return pd.DataFrame(columns, index=cache['__index__'])
+
+@instrumented
+def load_cached_data(file_path, cache_dir=None):
+    """
+    Load and clean the CSV file, reusing a binary cache of the cleaned data when the file has not changed.
+    
+    The cache is keyed by the size, modification time and SHA-256 hash of the CSV file and by CACHE_VERSION.
+    When the size and modification time match, the cache is used without hashing; otherwise the hash decides:
+    an unchanged file only has its new modification time recorded, and a changed file (or a cache written by
+    another version) is cleaned again and the cache rewritten.
+    
+    :param file_path: str, path to the CSV file
+    :param cache_dir: str, optional directory for the cache file (defaults to the directory of the CSV file)
     :return: cleaned pandas DataFrame
     """
-    # Handle missing values
-    df = df.dropna()  # Dropping rows with any missing values
+    cache_dir = cache_dir or os.path.dirname(os.path.abspath(file_path))
+    cache_path = os.path.join(cache_dir, os.path.basename(file_path) + '.cache.npz')
+    stat = os.stat(file_path)
+    source_key = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': None}
     
-    # Convert 'Birthdate' to datetime
-    df['Birthdate'] = pd.to_datetime(df['Birthdate'], errors='coerce')
+    cached_df = None
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cache:
+            meta = json.loads(cache['__meta__'].item())
+            cached_key = meta['source']
+            if meta.get('version') == CACHE_VERSION and cached_key['size'] == source_key['size']:
+                if cached_key['mtime_ns'] == source_key['mtime_ns']:
+                    return _load_frame_npz(cache)
+                source_key['sha256'] = _file_fingerprint(file_path)
+                if cached_key['sha256'] == source_key['sha256']:
+                    cached_df = _load_frame_npz(cache)
+    if cached_df is not None:
+        # Same content with a new modification time: record it so the next calls skip the hash
+        _save_frame_npz(cached_df, cache_path, source_key)
+        return cached_df
     
-    # Convert 'LoyaltyMember' to string and then to boolean
-    df['LoyaltyMember'] = df['LoyaltyMember'].astype(str).str.upper() == 'TRUE'
+    # Cache is missing or stale: clean the CSV file and store the result
+    cleaned_df = clean_data(load_data(file_path))
+    source_key['sha256'] = source_key['sha256'] or _file_fingerprint(file_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    _save_frame_npz(cleaned_df, cache_path, source_key)
+    return cleaned_df
+
+# Incremental Statistics: Update the Statistics with Batches of Passengers
+class PassengerStatistics:
+    """
+    Running per-class and per-flight statistics that are updated with batches of cleaned passengers.
     
-    # Drop any rows where 'Birthdate' conversion failed
-    df = df.dropna(subset=['Birthdate'])
+    Only per-class totals (birth year sum, passenger count, loyalty count) and per-flight/class passenger counts
+    are kept, so adding or removing a batch costs time proportional to the batch, and the statistics can be read
+    at any time without rescanning the passengers. Average ages are year-based (reference year minus birth year).
+    """
+
+    def __init__(self, track_members=False):
+        """
+        :param track_members: bool, if True also keep the names of loyalty members so loyalty_members() can list them
+        """
+        self.class_totals = {}  # travel class -> [birth year sum, passenger count, loyalty member count]
+        self.flight_class_counts = {}  # (flight number, travel class) -> passenger count
+        self.track_members = track_members
+        self.members = {}  # passenger ID -> name of loyalty members, only filled when track_members is set
+
+    def add(self, df):
+        """
+        Add a batch of passengers to the statistics.
+        
+        :param df: cleaned pandas DataFrame
+        :return: self, so calls can be chained
+        """
+        self._update(df, 1)
+        return self
+
+    def remove(self, df):
+        """
+        Retract a batch of passengers that was previously added.
+        
+        :param df: cleaned pandas DataFrame
+        :return: self, so calls can be chained
+        """
+        self._update(df, -1)
+        return self
+
+    def _update(self, df, sign):
+        """
+        Add (sign=1) or subtract (sign=-1) the aggregates of a batch of passengers.
+        """
+        data = pd.DataFrame({'BirthYear': _birth_years(df), 'LoyaltyMember': df['LoyaltyMember']})
+        class_totals = data.groupby(df['TravelClass'], sort=False, observed=True).agg(
+            BirthYearSum=('BirthYear', 'sum'), Passengers=('BirthYear', 'count'), LoyaltyMembers=('LoyaltyMember', 'sum'))
+        for travel_class, birth_year_sum, passengers, loyalty_members in class_totals.itertuples():
+            totals = self.class_totals.setdefault(travel_class, [0, 0, 0])
+            totals[0] += sign * int(birth_year_sum)
+            totals[1] += sign * int(passengers)
+            totals[2] += sign * int(loyalty_members)
+            if totals[1] == 0:
+                del self.class_totals[travel_class]
+        
+        flight_counts = df.groupby(['FlightNumber', 'TravelClass'], observed=True).size()
+        for key, count in flight_counts.items():
+            count = self.flight_class_counts.get(key, 0) + sign * int(count)
+            if count:
+                self.flight_class_counts[key] = count
+            else:
+                self.flight_class_counts.pop(key, None)
+        
+        if self.track_members:
+            members = df.loc[df['LoyaltyMember'], ['PassengerID', 'Name']]
+            if sign > 0:
+                self.members.update(zip(members['PassengerID'].tolist(), members['Name'].tolist()))
+            else:
+                for passenger_id in members['PassengerID'].tolist():
+                    self.members.pop(passenger_id, None)
+
+    def merge(self, other):
+        """
+        Add the statistics of another PassengerStatistics object, e.g. one built from another file or shard.
+        
+        :param other: PassengerStatistics
+        :return: self, so calls can be chained
+        """
+        for travel_class, other_totals in other.class_totals.items():
+            totals = self.class_totals.setdefault(travel_class, [0, 0, 0])
+            for i, value in enumerate(other_totals):
+                totals[i] += value
+        for key, count in other.flight_class_counts.items():
+            self.flight_class_counts[key] = self.flight_class_counts.get(key, 0) + count
+        self.members.update(other.members)
+        return self
+
+    def to_dict(self):
+        """
+        Get the statistics as a JSON-serializable dictionary (see from_dict).
+        
+        :return: dict
+        """
+        return {
+            'class_totals': self.class_totals,
+            'flight_class_counts': [[flight, travel_class, count]
+                                    for (flight, travel_class), count in self.flight_class_counts.items()],
+            'track_members': self.track_members,
+            'members': list(self.members.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild statistics saved with to_dict.
+        
+        :param data: dict from to_dict
+        :return: PassengerStatistics
+        """
+        statistics = cls(track_members=data['track_members'])
+        statistics.class_totals = {travel_class: list(totals) for travel_class, totals in data['class_totals'].items()}
+        statistics.flight_class_counts = {(flight, travel_class): count
+                                          for flight, travel_class, count in data['flight_class_counts']}
+        statistics.members = dict(map(tuple, data['members']))
+        return statistics
+
+    @property
+    def loyalty_count(self):
+        """
+        Number of loyalty members added so far.
+        """
+        return sum(totals[2] for totals in self.class_totals.values())
+
+    def class_statistics(self, reference_date=None):
+        """
+        Get the statistics for each travel class in the same shape as get_class_statistics.
+        
+        :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+        :return: dict, statistics for each travel class
+        """
+        reference_year = (reference_date or date.today()).year
+        return {
+            travel_class: {
+                'Average Age': (reference_year * passengers - birth_year_sum) / passengers,
+                'Loyalty Members': loyalty_members
+            }
+            for travel_class, (birth_year_sum, passengers, loyalty_members) in self.class_totals.items()
+        }
+
+    def loyalty_members(self):
+        """
+        Get the names of the loyalty members added so far (requires track_members=True).
+        
+        :return: list, names of loyalty program members
+        """
+        if not self.track_members:
+            raise ValueError("Loyalty member names are only kept when PassengerStatistics(track_members=True)")
+        return list(self.members.values())
+
+    def class_flight_pivot(self, top_n=None, by_carrier=False, max_rows=None):
+        """
+        Get the passenger count for each flight and travel class, optionally reduced to a bounded number of rows.
+        
+        :param top_n: int, optional number of busiest flights (or carriers) to keep, the rest summed into 'Other'
+        :param by_carrier: bool, if True group the flights by carrier prefix ('BA249' -> 'BA')
+        :param max_rows: int, optional maximum number of rows; consecutive flights are merged into ranges beyond it
+        :return: pandas DataFrame in the same layout as
+                 df.pivot_table(index='FlightNumber', columns='TravelClass', aggfunc='size', fill_value=0)
+        """
+        if not self.flight_class_counts:
+            return pd.DataFrame()
+        return reduce_flight_class_counts(flight_class_counts(self), top_n, by_carrier, max_rows)
+
+@instrumented
+def summarize_chunks(chunks, reference_date=None):
+    """
+    Build the class statistics, loyalty member count and flight/class pivot incrementally from cleaned chunks.
+    
+    Only the running aggregates are kept in memory, so the chunks can come straight from iter_clean_data.
+    
+    :param chunks: iterable of cleaned pandas DataFrames
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :return: tuple (class statistics dict, number of loyalty members, flight/class pivot DataFrame)
+    """
+    statistics = PassengerStatistics()
+    for chunk in chunks:
+        statistics.add(chunk)
+    return statistics.class_statistics(reference_date), statistics.loyalty_count, statistics.class_flight_pivot()
+
+# Flight/Class Counts: Bounded Pivots for Thousands of Flights
+def flight_class_counts(source):
+    """
+    Get the passenger count of every flight and travel class pair that has passengers.
     
-    # Ensure 'PassengerID' is an integer
-    df['PassengerID'] = df['PassengerID'].astype(int)
+    The counts are kept in long (sparse) form, so their size grows with the pairs that occur rather than
+    with flights x classes.
     
-    return df
+    :param source: cleaned pandas DataFrame, or PassengerStatistics built from streamed chunks
+    :return: pandas Series of counts indexed by (FlightNumber, TravelClass)
+    """
+    if isinstance(source, PassengerStatistics):
+        index = pd.MultiIndex.from_tuples(list(source.flight_class_counts), names=['FlightNumber', 'TravelClass'])
+        return pd.Series(list(source.flight_class_counts.values()), index=index, dtype='int64')
+    return source.groupby(['FlightNumber', 'TravelClass'], observed=True).size()
+
+def reduce_flight_class_counts(counts, top_n=None, by_carrier=False, max_rows=None):
+    """
+    Pivot flight/class counts into a flight x class table with a bounded number of rows.
+    
+    The reductions are applied in this order, on the sparse counts, so only the final table is materialized:
+    by_carrier groups the flights by their letter prefix ('BA249' -> 'BA'); top_n keeps the rows with the most
+    passengers (busiest first) and sums the others into an 'Other' row; max_rows merges runs of consecutive rows
+    into ranges such as 'AA100..AA163' until at most max_rows are left.
+    
+    :param counts: pandas Series of counts indexed by (FlightNumber, TravelClass), see flight_class_counts
+    :param top_n: int, optional number of busiest rows to keep
+    :param by_carrier: bool, if True group the flights by carrier prefix
+    :param max_rows: int, optional maximum number of rows
+    :return: pandas DataFrame of counts indexed by flight (or carrier, or range) with one column per travel class
+    """
+    flights = counts.index.get_level_values('FlightNumber').astype(str)
+    travel_classes = counts.index.get_level_values('TravelClass').astype(str)
+    if by_carrier:
+        carriers = flights.str.extract(r'^([A-Za-z]+)', expand=False)
+        flights = carriers.where(carriers.notna(), flights)
+    rows = pd.Series(flights, index=counts.index)
+    
+    if top_n is not None:
+        totals = counts.groupby(rows.to_numpy()).sum()
+        top_rows = totals.sort_values(ascending=False, kind='stable').index[:top_n]
+        is_top = rows.isin(top_rows)
+        rows = rows.where(is_top, 'Other')
+        row_order = list(top_rows) + ([] if is_top.all() else ['Other'])
+    else:
+        row_order = sorted(rows.unique())
+    
+    if max_rows is not None and len(row_order) > max_rows:
+        # Split the rows into max_rows runs of (nearly) equal length, labelled by their first and last row
+        run_of_row = np.arange(len(row_order)) * max_rows // len(row_order)
+        runs = pd.Series(row_order).groupby(run_of_row).agg(['first', 'last'])
+        run_labels = [first if first == last else f'{first}..{last}' for first, last in runs.itertuples(index=False)]
+        positions = pd.Index(row_order).get_indexer(rows.to_numpy())
+        rows = pd.Series(np.asarray(run_labels, dtype=object)[run_of_row[positions]], index=counts.index)
+        row_order = run_labels
+    
+    class_flight_pivot = counts.groupby([rows.to_numpy(), travel_classes]).sum().unstack(fill_value=0)
+    class_flight_pivot = class_flight_pivot.reindex(index=row_order, columns=sorted(class_flight_pivot.columns))
+    return class_flight_pivot.rename_axis(index='FlightNumber', columns='TravelClass')
+
+@instrumented
+def class_flight_pivot(df, top_n=None, by_carrier=False, max_rows=None):
+    """
+    Get the passenger count for each flight and travel class of a DataFrame, optionally reduced to a bounded number of rows.
+    
+    :param df: cleaned pandas DataFrame
+    :param top_n: int, optional number of busiest flights (or carriers) to keep, the rest summed into 'Other'
+    :param by_carrier: bool, if True group the flights by carrier prefix ('BA249' -> 'BA')
+    :param max_rows: int, optional maximum number of rows; consecutive flights are merged into ranges beyond it
+    :return: pandas DataFrame of counts indexed by FlightNumber with one column per TravelClass
+    """
+    return reduce_flight_class_counts(flight_class_counts(df), top_n, by_carrier, max_rows)
+
+# Batch Ingestion: Load Many Manifest Files in Parallel
+def find_manifest_files(path):
+    """
+    List the manifest CSV files in a directory, or the files matching a glob pattern.
+    
+    :param path: str, directory containing CSV files or a glob pattern such as 'manifests/2024-05-*.csv',
+                 or a list of such paths (e.g. file names expanded by the shell)
+    :return: list of str, sorted file paths without duplicates
+    """
+    if not isinstance(path, (str, os.PathLike)):
+        return sorted({file_path for single_path in path for file_path in find_manifest_files(single_path)})
+    if os.path.isdir(path):
+        path = os.path.join(path, '*.csv')
+    return sorted(glob.glob(path))
+
+def _load_and_clean_file(file_path, travel_dates=False):
+    """
+    Load and clean a single manifest file (runs in a worker process).
+    
+    :param file_path: str, path to the CSV file
+    :param travel_dates: bool, if True add a 'TravelDate' column taken from the file name
+    :return: cleaned pandas DataFrame
+    """
+    return clean_data(load_data(file_path, travel_date='auto' if travel_dates else None))
+
+def _summarize_file(file_path, chunksize=100_000):
+    """
+    Build the running statistics of a single manifest file chunk by chunk (runs in a worker process).
+    
+    :param file_path: str, path to the CSV file
+    :param chunksize: int, maximum number of rows per chunk
+    :return: PassengerStatistics
+    """
+    statistics = PassengerStatistics()
+    for chunk in iter_clean_data(file_path, chunksize):
+        statistics.add(chunk)
+    return statistics
+
+def _map_files(function, file_paths, processes):
+    """
+    Apply a function to every file, using a process pool when there is more than one file.
+    
+    :param function: picklable callable taking a file path
+    :param file_paths: list of str, file paths
+    :param processes: int, number of worker processes (defaults to the number of CPUs)
+    :return: list of results in file order
+    """
+    if len(file_paths) <= 1 or processes == 1:
+        return [function(file_path) for file_path in file_paths]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(function, file_paths))
+
+@instrumented
+def load_many(path, processes=None, travel_dates=False):
+    """
+    Load and clean every manifest file in a directory or glob pattern in parallel and combine them.
+    
+    :param path: str, directory containing CSV files or a glob pattern (or a list of them)
+    :param processes: int, number of worker processes (defaults to the number of CPUs)
+    :param travel_dates: bool, if True add a 'TravelDate' column taken from each file name (one manifest per day,
+                         see travel_date_from_path), for the date-partitioned mode of get_class_statistics
+    :return: cleaned pandas DataFrame with the passengers of all files
+    """
+    file_paths = find_manifest_files(path)
+    if not file_paths:
+        raise FileNotFoundError(f"No manifest files found for {path!r}")
+    frames = list(_map_files(partial(_load_and_clean_file, travel_dates=travel_dates), file_paths, processes))
+    
+    # Files can have different categories, which would turn the combined columns into plain text;
+    # recode every file to the union of the categories first so only the small integer codes are concatenated
+    categories = {column: pd.Index(sorted(set().union(*(frame[column].cat.categories for frame in frames))))
+                  for column in ['TravelClass', 'FlightNumber']}
+    frames = [frame.assign(**{column: frame[column].cat.set_categories(column_categories)
+                              for column, column_categories in categories.items()})
+              for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+@instrumented
+def summarize_many(path, processes=None, reference_date=None, chunksize=100_000):
+    """
+    Build the class statistics, loyalty member count and flight/class pivot of many manifest files in parallel.
+    
+    Each worker reduces its file to a PassengerStatistics object, so the passengers are never combined into one DataFrame.
+    
+    :param path: str, directory containing CSV files or a glob pattern (or a list of them)
+    :param processes: int, number of worker processes (defaults to the number of CPUs)
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :param chunksize: int, maximum number of rows per chunk within each file
+    :return: tuple (class statistics dict, number of loyalty members, flight/class pivot DataFrame)
+    """
+    file_paths = find_manifest_files(path)
+    statistics = PassengerStatistics()
+    for file_statistics in _map_files(partial(_summarize_file, chunksize=chunksize), file_paths, processes):
+        statistics.merge(file_statistics)
+    return statistics.class_statistics(reference_date), statistics.loyalty_count, statistics.class_flight_pivot()
+
+# Date-Partitioned Statistics: Daily or Weekly Trends from Per-Partition Summaries
+# Partition frequencies: 'D' for one partition per day, 'W' for one per week (Monday to Sunday)
+PARTITION_FREQUENCIES = ['D', 'W']
+
+# Metrics available per partition and per rolling window
+TREND_METRICS = ['Average Age', 'Loyalty Members', 'Passengers', 'Loyalty Share', 'Flights', 'Flight Load']
+
+class PartitionedStatistics:
+    """
+    Per-class statistics of every day or week, kept as one PassengerStatistics summary per partition.
+    
+    Adding passengers only updates the partitions of their travel dates, and the trends (per-partition and
+    rolling-window statistics) are computed from the per-partition totals, a few numbers per class, never
+    from the passengers. A new day of data therefore costs time proportional to that day, whatever the
+    length of the history.
+    
+    Ages are year-based. Unless a reference date is given, they are computed at the travel date (the year of
+    the first day of the partition), so the average ages of a trend are comparable across the year. 'Flights'
+    counts the flight numbers with passengers in the class during the partition, and 'Flight Load' is the
+    average number of passengers per such flight; over a rolling window both add up the partitions.
+    """
+
+    def __init__(self, freq='D'):
+        """
+        :param freq: str, partition frequency from PARTITION_FREQUENCIES ('D' daily, 'W' weekly)
+        """
+        if freq not in PARTITION_FREQUENCIES:
+            raise ValueError(f"Unknown partition frequency {freq!r}; expected one of {PARTITION_FREQUENCIES}")
+        self.freq = freq
+        self.partitions = {}  # first day of the partition (pandas Timestamp) -> PassengerStatistics
+
+    def partition_start(self, travel_dates):
+        """
+        Get the first day of the partition of each travel date (the Monday of its week for weekly partitions).
+        
+        :param travel_dates: array-like of dates
+        :return: pandas DatetimeIndex
+        """
+        return pd.DatetimeIndex(travel_dates).to_period(self.freq).start_time
+
+    def add(self, df):
+        """
+        Add cleaned passengers with a 'TravelDate' column (see load_data) to the partitions of their travel dates.
+        
+        :param df: cleaned pandas DataFrame
+        :return: self, so calls can be chained
+        """
+        if 'TravelDate' not in df.columns:
+            raise ValueError("The date-partitioned mode needs a 'TravelDate' column (load the data with travel_date)")
+        for start, partition_df in df.groupby(self.partition_start(df['TravelDate']), sort=False):
+            self.partitions.setdefault(start, PassengerStatistics()).add(partition_df)
+        return self
+
+    def add_summary(self, travel_date, statistics):
+        """
+        Add the statistics of passengers who all travelled on one date, e.g. the summary of a daily manifest.
+        
+        :param travel_date: datetime.date of the flights
+        :param statistics: PassengerStatistics
+        :return: self, so calls can be chained
+        """
+        start = self.partition_start([travel_date])[0]
+        self.partitions.setdefault(start, PassengerStatistics()).merge(statistics)
+        return self
+
+    def merge(self, other):
+        """
+        Add the partitions of another PartitionedStatistics object with the same frequency.
+        
+        :param other: PartitionedStatistics
+        :return: self, so calls can be chained
+        """
+        if other.freq != self.freq:
+            raise ValueError("Only partitioned statistics with the same frequency can be merged")
+        for start, statistics in other.partitions.items():
+            self.partitions.setdefault(start, PassengerStatistics()).merge(statistics)
+        return self
+
+    def _totals(self, reference_date=None):
+        """
+        Sum the ages, passengers, loyalty members and flights of every partition and travel class.
+        
+        :return: pandas DataFrame indexed by ('Period', 'TravelClass')
+        """
+        rows = []
+        for start in sorted(self.partitions):
+            statistics = self.partitions[start]
+            reference_year = (reference_date or start).year
+            flights = {}
+            for _, travel_class in statistics.flight_class_counts:
+                flights[travel_class] = flights.get(travel_class, 0) + 1
+            for travel_class, (birth_year_sum, passengers, loyalty_members) in statistics.class_totals.items():
+                rows.append((start, travel_class, reference_year * passengers - birth_year_sum, passengers,
+                             loyalty_members, flights.get(travel_class, 0)))
+        columns = ['Period', 'TravelClass', 'AgeSum', 'Passengers', 'LoyaltyMembers', 'Flights']
+        return pd.DataFrame(rows, columns=columns).set_index(['Period', 'TravelClass'])
+
+    def trend(self, reference_date=None, window=None):
+        """
+        Get the TREND_METRICS of every travel class per partition, or over a rolling window of partitions.
+        
+        Rolling windows are running sums over the per-partition totals: each partition is added once when the
+        window reaches it and subtracted once when the window leaves it.
+        
+        :param reference_date: datetime.date, date at which the ages are computed (defaults to each travel date)
+        :param window: int, optional number of consecutive partitions (days or weeks, including those without
+                       passengers) summed into each row, ending at the row's period
+        :return: pandas DataFrame indexed by ('Period', 'TravelClass') with one column per metric
+        """
+        totals = self._totals(reference_date)
+        if window and not totals.empty:
+            periods = pd.date_range(min(self.partitions), max(self.partitions), freq='D' if self.freq == 'D' else 'W-MON')
+            by_period = totals.unstack('TravelClass', fill_value=0).reindex(periods, fill_value=0)
+            totals = by_period.rolling(window, min_periods=1).sum().rename_axis('Period').stack('TravelClass').astype('int64')
+            totals = totals[totals['Passengers'] > 0]
+        
+        return pd.DataFrame({
+            'Average Age': totals['AgeSum'] / totals['Passengers'],
+            'Loyalty Members': totals['LoyaltyMembers'],
+            'Passengers': totals['Passengers'],
+            'Loyalty Share': totals['LoyaltyMembers'] / totals['Passengers'],
+            'Flights': totals['Flights'],
+            'Flight Load': totals['Passengers'] / totals['Flights'],
+        }, index=totals.index)
+
+    def class_statistics(self, metrics=('Average Age', 'Loyalty Members'), reference_date=None, window=None):
+        """
+        Get the statistics for each partition and travel class in the shape of the date-partitioned get_class_statistics.
+        
+        :param metrics: iterable of metric names from TREND_METRICS
+        :param reference_date: datetime.date, date at which the ages are computed (defaults to each travel date)
+        :param window: int, optional number of partitions per rolling window (see trend)
+        :return: dict, first day of the partition ('YYYY-MM-DD') -> travel class -> metric -> value
+        """
+        metrics = list(metrics)
+        unknown_metrics = [metric for metric in metrics if metric not in TREND_METRICS]
+        if unknown_metrics:
+            raise ValueError(f"Metric(s) not available per partition: {unknown_metrics}; expected {TREND_METRICS}")
+        
+        statistics = {}
+        for (start, travel_class), values in self.trend(reference_date, window)[metrics].to_dict(orient='index').items():
+            statistics.setdefault(start.date().isoformat(), {})[travel_class] = values
+        return statistics
+
+def _summarize_partition_file(file_path, chunksize=100_000):
+    """
+    Build the running statistics of a daily manifest file and read its travel date (runs in a worker process).
+    
+    :param file_path: str, path to the CSV file
+    :param chunksize: int, maximum number of rows per chunk
+    :return: tuple (datetime.date, PassengerStatistics)
+    """
+    return travel_date_from_path(file_path), _summarize_file(file_path, chunksize)
+
+def _cached_file_fingerprint(cache, file_path):
+    """
+    Get the SHA-256 hash of a file, hashing it only when its size or modification time changed since it was last
+    hashed (like load_cached_data); the hash is kept in the result cache under the path, size and modification time.
+    
+    :param cache: ResultCache
+    :param file_path: str, path to the file
+    :return: str, hexadecimal digest
+    """
+    stat = os.stat(file_path)
+    key = cache.key(os.path.abspath(file_path), '_file_fingerprint', {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+    fingerprint = cache.get(key)
+    if fingerprint is not None:
+        return fingerprint.decode()
+    fingerprint = _file_fingerprint(file_path)
+    cache.put(key, fingerprint.encode())
+    return fingerprint
+
+@instrumented
+def summarize_partitions(path, freq='D', processes=None, cache=None, chunksize=100_000):
+    """
+    Build the date-partitioned statistics of daily manifest files (travel date in the file name) in parallel.
+    
+    With a result cache, the summary of every file is stored under the file's SHA-256 hash, and the hash itself
+    under the file's size and modification time. When a new day's manifest arrives only that file is read; the
+    other days come from their stored summaries without reading (or hashing) their files again.
+    
+    :param path: str, directory containing CSV files or a glob pattern (or a list of them)
+    :param freq: str, partition frequency from PARTITION_FREQUENCIES ('D' daily, 'W' weekly)
+    :param processes: int, number of worker processes (defaults to the number of CPUs)
+    :param cache: ResultCache, optional cache of the per-file summaries
+    :param chunksize: int, maximum number of rows per chunk within each file
+    :return: PartitionedStatistics
+    """
+    file_paths = find_manifest_files(path)
+    partitioned = PartitionedStatistics(freq)
+    summaries = {}
+    keys = {}
+    if cache is not None:
+        for file_path in file_paths:
+            keys[file_path] = cache.key(_cached_file_fingerprint(cache, file_path), '_summarize_partition_file',
+                                        {'travel_date': travel_date_from_path(file_path).isoformat()})
+            data = cache.get(keys[file_path])
+            if data is not None:
+                summaries[file_path] = PassengerStatistics.from_dict(json.loads(data))
+    
+    missing_paths = [file_path for file_path in file_paths if file_path not in summaries]
+    for file_path, (_, statistics) in zip(missing_paths, _map_files(partial(_summarize_partition_file, chunksize=chunksize),
+                                                                    missing_paths, processes)):
+        summaries[file_path] = statistics
+        if cache is not None:
+            cache.put(keys[file_path], json.dumps(statistics.to_dict()).encode())
+    
+    for file_path in file_paths:
+        partitioned.add_summary(travel_date_from_path(file_path), summaries[file_path])
+    return partitioned
+
+# Approximate Statistics: Fixed-Memory Sketches for Very Large Manifests
+class PassengerSketch:
+    """
+    Mergeable, fixed-memory summary of any number of cleaned passengers for the approximate mode of
+    get_class_statistics, plot_age_distribution and plot_class_age_heatmap (pass the sketch instead of a DataFrame).
+
+    Error bounds, with the default sizes:
+    - Ages: a per-class histogram of birth years with one bin per year. Counts, average ages and age groups are
+      exact for year-based ages; median/min/max ages are nearest-rank values, within one bin width (1 year).
+    - Flight/class counts: a count-min sketch (2048 x 5 counters) that never undercounts and overcounts by more
+      than 0.13% of all passengers with probability below 0.7%.
+    - Distinct passengers: a HyperLogLog estimate of the distinct PassengerIDs with a relative standard error of 0.81%.
+
+    Memory is fixed per travel class (about 1.6 KiB each) plus about 96 KiB for the counters, however many
+    passengers are added. Sketches built with the same sizes and seed, e.g. one per shard, merge exactly.
+    """
+
+    def __init__(self, birth_year_range=(1900, 2100), flight_width=2048, flight_depth=5, precision=14, seed=0):
+        """
+        :param birth_year_range: tuple (first year, last year + 1) covered by the age histograms, one bin per year
+        :param flight_width: int, counters per row of the flight/class count-min sketch
+        :param flight_depth: int, rows of the flight/class count-min sketch
+        :param precision: int, HyperLogLog precision for the distinct passenger count
+        :param seed: int, hash seed shared by sketches that will be merged
+        """
+        self.birth_year_range = birth_year_range
+        self.class_birth_years = {}  # travel class -> HistogramSketch of birth years
+        self.class_loyalty = {}  # travel class -> loyalty member count
+        self.flight_class_counts = CountMinSketch(flight_width, flight_depth, seed)
+        self.passenger_ids = HyperLogLog(precision, seed)
+
+    def _histogram(self, travel_class):
+        """
+        Get the birth year histogram of a travel class, creating it when the class is new.
+        """
+        histogram = self.class_birth_years.get(travel_class)
+        if histogram is None:
+            low, high = self.birth_year_range
+            histogram = self.class_birth_years[travel_class] = HistogramSketch(low, high, high - low)
+            self.class_loyalty[travel_class] = 0
+        return histogram
+
+    def add(self, df):
+        """
+        Add a batch of passengers to the sketch.
+
+        :param df: cleaned pandas DataFrame
+        :return: self, so calls can be chained
+        """
+        classes = df['TravelClass']
+        for travel_class, birth_years in _birth_years(df).groupby(classes, sort=False, observed=True):
+            self._histogram(travel_class).update(birth_years.to_numpy())
+        for travel_class, loyalty_members in df['LoyaltyMember'].groupby(classes, sort=False, observed=True).sum().items():
+            self.class_loyalty[travel_class] += int(loyalty_members)
+
+        flight_counts = df.groupby(['FlightNumber', 'TravelClass'], observed=True).size()
+        keys = [f'{flight}|{travel_class}' for flight, travel_class in flight_counts.index]
+        self.flight_class_counts.update(keys, flight_counts.to_numpy())
+        self.passenger_ids.update(df['PassengerID'].to_numpy())
+        return self
+
+    def merge(self, other):
+        """
+        Add the sketch of another batch of passengers, e.g. one built from another file or shard.
+
+        :param other: PassengerSketch built with the same sizes and seed
+        :return: self, so calls can be chained
+        """
+        if other.birth_year_range != self.birth_year_range:
+            raise ValueError("Only sketches with the same birth year range can be merged")
+        for travel_class, histogram in other.class_birth_years.items():
+            self._histogram(travel_class).merge(histogram)
+            self.class_loyalty[travel_class] += other.class_loyalty[travel_class]
+        self.flight_class_counts.merge(other.flight_class_counts)
+        self.passenger_ids.merge(other.passenger_ids)
+        return self
+
+    @property
+    def passengers(self):
+        """
+        Number of passengers added so far (exact).
+        """
+        return sum(histogram.count for histogram in self.class_birth_years.values())
+
+    def distinct_passengers(self):
+        """
+        Estimated number of distinct PassengerIDs added so far.
+        """
+        return round(self.passenger_ids.estimate())
+
+    def flight_class_count(self, flight_number, travel_class):
+        """
+        Estimated number of passengers of a travel class on a flight (never below the true count).
+        """
+        return int(self.flight_class_counts.estimate([f'{flight_number}|{travel_class}'])[0])
+
+    def class_statistics(self, metrics=('Average Age', 'Loyalty Members'), reference_date=None):
+        """
+        Get the requested CLASS_METRICS for each travel class in the same shape as get_class_statistics.
+
+        :param metrics: iterable of metric names from CLASS_METRICS
+        :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+        :return: dict, statistics for each travel class
+        """
+        unknown_metrics = [metric for metric in metrics if metric not in CLASS_METRICS]
+        if unknown_metrics:
+            raise ValueError(f"Unknown class metric(s): {unknown_metrics}")
+
+        reference_year = (reference_date or date.today()).year
+        class_statistics = {}
+        for travel_class, histogram in self.class_birth_years.items():
+            loyalty_members = self.class_loyalty[travel_class]
+            values = {
+                'Average Age': reference_year - histogram.mean(),
+                'Loyalty Members': loyalty_members,
+                'Passengers': histogram.count,
+                'Min Age': reference_year - histogram.quantile(1),
+                'Max Age': reference_year - histogram.quantile(0),
+                'Median Age': reference_year - histogram.quantile(0.5),
+                'Loyalty Share': loyalty_members / histogram.count,
+            }
+            class_statistics[travel_class] = {metric: values[metric] for metric in metrics}
+        return class_statistics
+
+    def age_counts(self, reference_date=None, travel_class=None):
+        """
+        Get the number of passengers of each age, for all passengers or for one travel class.
+
+        :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+        :param travel_class: str, optional travel class
+        :return: pandas Series of passenger counts indexed by age, youngest first
+        """
+        histograms = [self.class_birth_years[travel_class]] if travel_class is not None else self.class_birth_years.values()
+        low, high = self.birth_year_range
+        counts = sum((histogram.counts for histogram in histograms), np.zeros(high - low, dtype=np.int64))
+        ages = (reference_date or date.today()).year - np.arange(low, high)
+        age_counts = pd.Series(counts, index=pd.Index(ages, name='Age'), name='Passengers')[::-1]
+        return age_counts[age_counts > 0]
+
+    def class_age_pivot(self, reference_date=None, bins=range(0, 101, 10)):
+        """
+        Get the number of passengers in each age group and travel class.
+
+        :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+        :param bins: sequence of age group edges, as for pandas.cut
+        :return: pandas DataFrame indexed by age group with one column per travel class
+        """
+        class_age_counts = {}
+        for travel_class in self.class_birth_years:
+            age_counts = self.age_counts(reference_date, travel_class)
+            age_groups = pd.cut(age_counts.index, bins=bins)
+            class_age_counts[travel_class] = age_counts.groupby(age_groups, observed=False).sum()
+        return pd.DataFrame(class_age_counts).rename_axis(index='Age', columns='TravelClass')
+
+def _sketch_file(file_path, chunksize=100_000):
+    """
+    Build the sketch of a single manifest file chunk by chunk (runs in a worker process).
+
+    :param file_path: str, path to the CSV file
+    :param chunksize: int, maximum number of rows per chunk
+    :return: PassengerSketch
+    """
+    sketch = PassengerSketch()
+    for chunk in iter_clean_data(file_path, chunksize):
+        sketch.add(chunk)
+    return sketch
+
+@instrumented
+def sketch_many(path, processes=None, chunksize=100_000):
+    """
+    Build one PassengerSketch from many manifest files in parallel, one sketch per file merged at the end.
+
+    :param path: str, manifest file, directory containing CSV files or glob pattern (or a list of them)
+    :param processes: int, number of worker processes (defaults to the number of CPUs)
+    :param chunksize: int, maximum number of rows per chunk within each file
+    :return: PassengerSketch
+    """
+    file_paths = find_manifest_files(path)
+    sketch = PassengerSketch()
+    for file_sketch in _map_files(partial(_sketch_file, chunksize=chunksize), file_paths, processes):
+        sketch.merge(file_sketch)
+    return sketch
+
+# Derived Columns: Passenger Age
+def _birth_years(df):
+    """
+    Get the birth year of every passenger, using the compact 'BirthYear' column when clean_data added it.
+    
+    :param df: pandas DataFrame
+    :return: pandas Series of integer birth years
+    """
+    if 'BirthYear' in df.columns:
+        return df['BirthYear'].astype(int)
+    return df['Birthdate'].dt.year
+
+# Ages already computed per DataFrame: (id(df), reference date, exact) -> (index, source columns, pandas Series)
+_AGE_CACHE = {}
+
+def _age_sources(df, exact):
+    """
+    Get the columns the ages are computed from, as Series sharing the DataFrame's data.
+    
+    Holding these Series makes pandas copy-on-write give the DataFrame a new array whenever one of the columns
+    is edited in place (df.loc[...] = ..., +=, replacing the column), so comparing their memory with the
+    DataFrame's current columns tells whether cached ages are still valid.
+    """
+    columns = ['BirthYear' if 'BirthYear' in df.columns else 'Birthdate']
+    if exact and columns[0] != 'Birthdate':
+        columns.append('Birthdate')
+    return [df[column] for column in columns]
+
+def _column_data(column):
+    """
+    Get the array holding the values of a column without copying it (the codes of a categorical column).
+    """
+    values = column.array
+    return values.codes if isinstance(values, pd.Categorical) else np.asarray(values)
+
+def _columns_unchanged(sources, cached_sources):
+    """
+    Check that columns taken from a DataFrame still share their data with columns taken from it earlier.
+    """
+    return len(sources) == len(cached_sources) and all(
+        np.may_share_memory(_column_data(source), _column_data(cached_source))
+        for source, cached_source in zip(sources, cached_sources))
+
+def passenger_ages(df, reference_date=None, exact=False):
+    """
+    Get the age of every passenger, computing it only once per DataFrame, reference date and age mode.
+    
+    The result is cached until the DataFrame is garbage collected, so every analysis and plotting function
+    can share it. The cache entry is checked against the birth year/birthdate columns (and the index) on every
+    call, so ages are computed again after the DataFrame is edited in place. The DataFrame itself is never modified.
+    
+    :param df: pandas DataFrame
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :param exact: bool, if True count completed years (birthday-aware); otherwise reference year minus birth year
+    :return: pandas Series of ages aligned with the DataFrame
+    """
+    if reference_date is None:
+        reference_date = date.today()
+    elif isinstance(reference_date, datetime):
+        reference_date = reference_date.date()
+    
+    key = (id(df), reference_date, exact)
+    sources = _age_sources(df, exact)
+    cached = _AGE_CACHE.get(key)
+    if cached is not None:
+        index, cached_sources, ages = cached
+        if index is df.index and _columns_unchanged(sources, cached_sources):
+            return ages
+    
+    ages = reference_date.year - _birth_years(df)
+    if exact:
+        # Subtract a year for passengers whose birthday has not come yet in the reference year
+        birthdates = df['Birthdate']
+        birthday_ahead = (birthdates.dt.month > reference_date.month) | (
+            (birthdates.dt.month == reference_date.month) & (birthdates.dt.day > reference_date.day))
+        ages = ages - birthday_ahead.astype(int)
+    ages = pd.Series(ages.to_numpy(), index=df.index, name='Age')
+    
+    if cached is None:
+        weakref.finalize(df, _AGE_CACHE.pop, key, None)
+    _AGE_CACHE[key] = (df.index, sources, ages)
+    return ages
+
+def age_view(df, columns=(), reference_date=None):
+    """
+    Get a narrow DataFrame of the shared passenger ages next to some columns of the data.
+    
+    The columns are not copied: the view holds the same arrays as the DataFrame and as passenger_ages,
+    so deriving 'Age' never duplicates the dataset and the DataFrame itself is never modified.
+    
+    :param df: pandas DataFrame
+    :param columns: iterable of str, columns of the DataFrame to include next to 'Age'
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :return: pandas DataFrame with an 'Age' column followed by the requested columns, aligned with the DataFrame
+    """
+    data = {'Age': passenger_ages(df, reference_date)}
+    data.update((column, df[column]) for column in columns)
+    return pd.DataFrame(data, copy=False)
 
 # Task 2.1: Calculate Average Age
-def calculate_average_age(df, travel_class):
+@instrumented
+def calculate_average_age(df, travel_class, reference_date=None):
     """
     Calculate the average age of passengers in the specified travel class.
     
     :param df: pandas DataFrame
     :param travel_class: str, the travel class to filter by (e.g., 'ECONOMY', 'BUSINESS', 'FIRST_CLASS')
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
     :return: float, the average age of passengers in the specified travel class
     """
-    # Filter the DataFrame by the specified travel class
-    class_df = df[df['TravelClass'] == travel_class].copy()
-    
-    # Calculate the current year to determine the age of passengers
-    current_year = datetime.now().year
-    
-    # Calculate ages
-    class_df.loc[:, 'Age'] = current_year - class_df['Birthdate'].dt.year
+    # Select the shared ages of the passengers in the specified travel class
+    ages = passenger_ages(df, reference_date)
     
     # Calculate and return the average age
-    return class_df['Age'].mean()
+    return ages[df['TravelClass'] == travel_class].mean()
 
 # Task 2.2: Find Loyalty Members
+@instrumented
 def find_loyalty_members(df):
     """
     Find names of passengers who are loyalty program members.
@@ -78,61 +1440,279 @@ def find_loyalty_members(df):
     # Return the list of names of loyalty program members
     return loyalty_df['Name'].tolist()
 
+# Per-class metrics understood by get_class_statistics: metric name -> (source column, aggregation)
+CLASS_METRICS = {
+    'Average Age': ('Age', 'mean'),
+    'Loyalty Members': ('LoyaltyMember', 'sum'),
+    'Passengers': ('Age', 'size'),
+    'Min Age': ('Age', 'min'),
+    'Max Age': ('Age', 'max'),
+    'Median Age': ('Age', 'median'),
+    'Loyalty Share': ('LoyaltyMember', 'mean'),
+}
+
+def _group_by_class(df, reference_date=None):
+    """
+    Group the age and loyalty columns of the DataFrame by travel class, keeping classes in order of appearance.
+    
+    :param df: pandas DataFrame
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :return: pandas DataFrameGroupBy with 'Age' and 'LoyaltyMember' columns
+    """
+    return age_view(df, ['LoyaltyMember'], reference_date).groupby(df['TravelClass'], sort=False, observed=True)
+
+@instrumented
+def aggregate_class_metrics(df, metrics=('Average Age', 'Loyalty Members'), reference_date=None):
+    """
+    Compute the requested metrics for every travel class in a single grouped pass over the data.
+    
+    :param df: pandas DataFrame
+    :param metrics: iterable of metric names from CLASS_METRICS
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :return: pandas DataFrame indexed by travel class with one column per metric
+    """
+    unknown_metrics = [metric for metric in metrics if metric not in CLASS_METRICS]
+    if unknown_metrics:
+        raise ValueError(f"Unknown class metric(s): {unknown_metrics}")
+    
+    return _group_by_class(df, reference_date).agg(**{metric: CLASS_METRICS[metric] for metric in metrics})
+
 # Task 3.1: Get Class Statistics
-def get_class_statistics(df):
+@instrumented
+def get_class_statistics(df, metrics=('Average Age', 'Loyalty Members'), reference_date=None, partition=None, window=None):
     """
     Get statistics for each travel class.
     
-    :param df: pandas DataFrame
-    :return: dict, statistics for each travel class
+    In the date-partitioned mode (partition set, or PartitionedStatistics given), the statistics are computed for
+    every day or week of travel, optionally over rolling windows of partitions; see PartitionedStatistics.
+    
+    :param df: pandas DataFrame, a PassengerSketch for approximate statistics in fixed memory,
+               or PartitionedStatistics for the date-partitioned mode
+    :param metrics: iterable of metric names from CLASS_METRICS (defaults to average age and loyalty members),
+                    or from TREND_METRICS in the date-partitioned mode
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today, or to the
+                           travel date in the date-partitioned mode)
+    :param partition: str, 'D' or 'W' to compute the statistics per day or week of the 'TravelDate' column
+    :param window: int, optional number of partitions per rolling window in the date-partitioned mode
+    :return: dict, statistics for each travel class, or partition start ('YYYY-MM-DD') -> statistics for each travel class
+    """
+    if partition is not None and not isinstance(df, PartitionedStatistics):
+        if not isinstance(df, pd.DataFrame):
+            raise ValueError(f"The date-partitioned mode needs a DataFrame with a 'TravelDate' column or PartitionedStatistics, "
+                             f"not {type(df).__name__}")
+        df = PartitionedStatistics(partition).add(df)
+    if isinstance(df, PartitionedStatistics):
+        return df.class_statistics(metrics, reference_date, window)
+    if window is not None:
+        raise ValueError("window is only used in the date-partitioned mode (set partition)")
+    if isinstance(df, PassengerSketch):
+        return df.class_statistics(metrics, reference_date)
+    return aggregate_class_metrics(df, metrics, reference_date).to_dict(orient='index')
+
+# Indexed Lookups: Query by Flight, Class and Passenger ID
+class PassengerIndex:
     """
-    class_statistics = {}
-    travel_classes = df['TravelClass'].unique()
+    Lookup structure built once over cleaned passenger data to answer per-flight, per-class and
+    per-flight/class queries, and passenger ID lookups, without scanning the whole DataFrame.
     
-    for travel_class in travel_classes:
-        avg_age = calculate_average_age(df, travel_class)
-        loyalty_members = df[(df['TravelClass'] == travel_class) & (df['LoyaltyMember'])].shape[0]
+    The row positions of every flight, class and flight/class pair are stored up front, so a query only
+    touches the rows it returns.
+    """
+
+    def __init__(self, df, reference_date=None):
+        """
+        :param df: cleaned pandas DataFrame
+        :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+        """
+        self.df = df
+        self._ages = passenger_ages(df, reference_date).to_numpy()
+        self._loyalty = df['LoyaltyMember'].to_numpy(dtype=bool)
+        self._names = df['Name'].to_numpy()
+        self._flight_positions = df.groupby('FlightNumber', observed=True).indices
+        self._class_positions = df.groupby('TravelClass', observed=True).indices
+        self._cell_positions = df.groupby(['FlightNumber', 'TravelClass'], observed=True).indices
+        self._passenger_ids = pd.Index(df['PassengerID'].to_numpy())
+
+    def positions(self, flight=None, travel_class=None):
+        """
+        Get the row positions of the passengers on a flight, in a travel class, or both.
         
-        class_statistics[travel_class] = {
-            
-            'Average Age': avg_age,
-            'Loyalty Members': loyalty_members
-        }
+        :param flight: str, flight number (e.g., 'BA249'), or None for all flights
+        :param travel_class: str, travel class (e.g., 'ECONOMY'), or None for all classes
+        :return: numpy array of row positions
+        """
+        if flight is not None and travel_class is not None:
+            positions = self._cell_positions.get((flight, travel_class))
+        elif flight is not None:
+            positions = self._flight_positions.get(flight)
+        elif travel_class is not None:
+            positions = self._class_positions.get(travel_class)
+        else:
+            return np.arange(len(self.df))
+        return np.empty(0, dtype=np.intp) if positions is None else positions
+
+    def passengers(self, flight=None, travel_class=None):
+        """
+        Get the passengers on a flight, in a travel class, or both.
+        
+        :param flight: str, flight number, or None for all flights
+        :param travel_class: str, travel class, or None for all classes
+        :return: pandas DataFrame
+        """
+        return self.df.iloc[self.positions(flight, travel_class)]
+
+    def passenger(self, passenger_id):
+        """
+        Look up a passenger by ID.
+        
+        :param passenger_id: int, passenger ID
+        :return: pandas Series with the passenger's row
+        :raises KeyError: if no passenger has this ID
+        """
+        return self.df.iloc[self._passenger_ids.get_loc(passenger_id)]
+
+    def count(self, flight=None, travel_class=None):
+        """
+        Count the passengers on a flight, in a travel class, or both.
+        
+        :param flight: str, flight number, or None for all flights
+        :param travel_class: str, travel class, or None for all classes
+        :return: int, number of passengers
+        """
+        return len(self.positions(flight, travel_class))
+
+    def average_age(self, flight=None, travel_class=None):
+        """
+        Calculate the average age of the passengers on a flight, in a travel class, or both.
+        
+        :param flight: str, flight number, or None for all flights
+        :param travel_class: str, travel class, or None for all classes
+        :return: float, average age (NaN when there are no matching passengers)
+        """
+        positions = self.positions(flight, travel_class)
+        return float(self._ages[positions].mean()) if len(positions) else float('nan')
+
+    def loyalty_members(self, flight=None, travel_class=None):
+        """
+        Find the names of the loyalty program members on a flight, in a travel class, or both.
+        
+        :param flight: str, flight number, or None for all flights
+        :param travel_class: str, travel class, or None for all classes
+        :return: list, names of loyalty program members
+        """
+        positions = self.positions(flight, travel_class)
+        return self._names[positions[self._loyalty[positions]]].tolist()
+
+# Plotting backends, imported by _load_plotting when the first chart is drawn so that analysis-only
+# callers (loading, cleaning, statistics) never pay for importing Matplotlib, Seaborn and Plotly
+plt = None
+sns = None
+px = None
+
+def _load_plotting(plotly=False):
+    """
+    Import Matplotlib and Seaborn, and Plotly if requested, the first time they are needed.
+    
+    :param plotly: bool, whether Plotly Express is needed as well
+    """
+    global plt, sns, px
+    if plt is None:
+        import matplotlib.pyplot as pyplot
+        import seaborn
+        plt, sns = pyplot, seaborn
+    if plotly and px is None:
+        import plotly.express as plotly_express
+        px = plotly_express
 
-    return class_statistics
+# Directory the charts are saved to when no output is given (set PASSENGER_OUTPUT_DIR to change it)
+OUTPUT_DIR = os.environ.get('PASSENGER_OUTPUT_DIR', os.path.dirname(os.path.abspath(__file__)))
+
+def _chart_target(chart, output, as_bytes, image_format):
+    """
+    Resolve where a chart is written: a new in-memory buffer, the caller's path or stream, or its file in OUTPUT_DIR.
+    
+    :param chart: str, chart name used for the default file name
+    :param output: str path, writable binary file object or None
+    :param as_bytes: bool, whether the image is returned as bytes
+    :param image_format: str, image format such as 'png' or 'svg'
+    :return: tuple (path or file object to write to, format to pass to the writer)
+    """
+    if as_bytes:
+        return io.BytesIO(), image_format
+    if output is None:
+        return os.path.join(OUTPUT_DIR, f'{chart}.{image_format}'), image_format
+    if isinstance(output, (str, os.PathLike)):
+        # Let the writer pick the format from the file extension
+        return output, None
+    return output, image_format
+
+def _finish_figure(chart, output, show, as_bytes, image_format):
+    """
+    Save the current Matplotlib figure, show it if requested and close it so batch runs do not accumulate figures.
+    
+    :param chart: str, chart name used for the default file name
+    :param output: str path, writable binary file object or None (see _chart_target)
+    :param show: bool, whether to display the figure
+    :param as_bytes: bool, whether to return the encoded image instead of writing it
+    :param image_format: str, image format such as 'png' or 'svg'
+    :return: bytes of the encoded image if as_bytes is set, otherwise None
+    """
+    target, target_format = _chart_target(chart, output, as_bytes, image_format)
+    plt.savefig(target, format=target_format)
+    if show and not as_bytes:
+        plt.show()
+    plt.close()
+    return target.getvalue() if as_bytes else None
 
 # Task 4.1: Plot Age Distribution
-def plot_age_distribution(df):
+@instrumented
+def plot_age_distribution(df, reference_date=None, output=None, show=True, as_bytes=False, image_format='png'):
     """
     Plot the distribution of ages using a histogram.
     
-    :param df: pandas DataFrame
+    :param df: pandas DataFrame, or a PassengerSketch to plot the histogram from its age counts
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :param output: str path or writable binary file object for the image (defaults to '<chart>.<image_format>' in OUTPUT_DIR)
+    :param show: bool, if False (or if as_bytes is set) the chart is only saved, not displayed
+    :param as_bytes: bool, if True return the encoded image instead of writing it anywhere
+    :param image_format: str, image format such as 'png' or 'svg'
+    :return: bytes of the encoded image if as_bytes is set, otherwise None
     """
-    # Calculate the current year to determine the age of passengers
-    current_year = datetime.now().year
-    df['Age'] = current_year - df['Birthdate'].dt.year
+    _load_plotting()
+    # A sketch gives one count per age, which weights the same 20 bins as the individual ages would
+    if isinstance(df, PassengerSketch):
+        age_counts = df.age_counts(reference_date)
+        ages, weights = age_counts.index, age_counts.to_numpy()
+    else:
+        ages, weights = passenger_ages(df, reference_date), None
     
     # Plot the histogram
     plt.figure(figsize=(10, 6))
-    plt.hist(df['Age'], bins=20, edgecolor='black', alpha=0.7)
+    plt.hist(ages, bins=20, weights=weights, edgecolor='black', alpha=0.7)
     plt.title('Age Distribution of Passengers')
     plt.xlabel('Age')
     plt.ylabel('Frequency')
     plt.grid(True)
-    plt.savefig('/Users/josemarchena/Python/Project1_marchenajose/age_distribution.png')
-    plt.show()
+    return _finish_figure('age_distribution', output, show, as_bytes, image_format)
 
 # Task 4.3: Plot Average Age by Class
-def plot_average_age_by_class(df):
+@instrumented
+def plot_average_age_by_class(df, reference_date=None, output=None, show=True, as_bytes=False, image_format='png'):
     """
     Plot the average age by travel class using a bar chart.
     
     :param df: pandas DataFrame
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :param output: str path or writable binary file object for the image (defaults to '<chart>.<image_format>' in OUTPUT_DIR)
+    :param show: bool, if False (or if as_bytes is set) the chart is only saved, not displayed
+    :param as_bytes: bool, if True return the encoded image instead of writing it anywhere
+    :param image_format: str, image format such as 'png' or 'svg'
+    :return: bytes of the encoded image if as_bytes is set, otherwise None
     """
-    # Calculate average age by travel class
-    current_year = datetime.now().year
-    df['Age'] = current_year - df['Birthdate'].dt.year
-    avg_age_by_class = df.groupby('TravelClass')['Age'].mean()
+    _load_plotting()
+    # Read the shared passenger ages next to the travel class, leaving the caller's DataFrame untouched
+    ages = age_view(df, ['TravelClass'], reference_date)
+    avg_age_by_class = ages.groupby('TravelClass', observed=True)['Age'].mean()
     
     # Plot the bar chart
     plt.figure(figsize=(10, 6))
@@ -142,73 +1722,101 @@ def plot_average_age_by_class(df):
     plt.ylabel('Average Age')
     plt.xticks(rotation=45)
     plt.grid(True)
-    plt.savefig('/Users/josemarchena/Python/Project1_marchenajose/average_age_by_class.png')
-    plt.show()
+    return _finish_figure('average_age_by_class', output, show, as_bytes, image_format)
 
 # Task 5.1: Plot Age vs. Loyalty
-def plot_age_vs_loyalty(df):
+@instrumented
+def plot_age_vs_loyalty(df, reference_date=None, output=None, show=True, as_bytes=False, image_format='png'):
     """
     Plot a scatter plot of age vs. loyalty membership using Seaborn.
     
     :param df: pandas DataFrame
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :param output: str path or writable binary file object for the image (defaults to '<chart>.<image_format>' in OUTPUT_DIR)
+    :param show: bool, if False (or if as_bytes is set) the chart is only saved, not displayed
+    :param as_bytes: bool, if True return the encoded image instead of writing it anywhere
+    :param image_format: str, image format such as 'png' or 'svg'
+    :return: bytes of the encoded image if as_bytes is set, otherwise None
     """
-    # Calculate the current year to determine the age of passengers
-    current_year = datetime.now().year
-    df['Age'] = current_year - df['Birthdate'].dt.year
+    _load_plotting()
+    # Read the shared passenger ages next to the plotted columns, leaving the caller's DataFrame untouched
+    ages = age_view(df, ['LoyaltyMember', 'TravelClass'], reference_date)
     
     # Plot the scatter plot using Seaborn
     plt.figure(figsize=(10, 6))
-    sns.scatterplot(data=df, x='Age', y='LoyaltyMember', hue='TravelClass', alpha=0.7)
+    sns.scatterplot(data=ages, x='Age', y='LoyaltyMember', hue='TravelClass', alpha=0.7)
     plt.title('Age vs. Loyalty Membership')
     plt.xlabel('Age')
     plt.ylabel('Loyalty Member')
     plt.grid(True)
-    plt.savefig('/Users/josemarchena/Python/Project1_marchenajose/age_vs_loyalty.png')
-    plt.show()
+    return _finish_figure('age_vs_loyalty', output, show, as_bytes, image_format)
 
 # Task 5.3: Plot Age Distribution by Class
-def plot_age_distribution_by_class(df):
+@instrumented
+def plot_age_distribution_by_class(df, reference_date=None, output=None, show=True, as_bytes=False, image_format='png'):
     """
     Plot the distribution of ages for each travel class using a box plot with Plotly.
     
     :param df: pandas DataFrame
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :param output: str path or writable binary file object for the image (defaults to '<chart>.<image_format>' in OUTPUT_DIR)
+    :param show: bool, if False (or if as_bytes is set) the chart is only saved, not displayed
+    :param as_bytes: bool, if True return the encoded image instead of writing it anywhere
+    :param image_format: str, image format such as 'png' or 'svg'
+    :return: bytes of the encoded image if as_bytes is set, otherwise None
     """
-    # Calculate the current year to determine the age of passengers
-    current_year = datetime.now().year
-    df['Age'] = current_year - df['Birthdate'].dt.year
+    _load_plotting(plotly=True)
+    # Read the shared passenger ages next to the travel class, leaving the caller's DataFrame untouched
+    ages = age_view(df, ['TravelClass'], reference_date)
     
     # Plot the box plot using Plotly
-    fig = px.box(df, x='TravelClass', y='Age', color='TravelClass', title='Age Distribution by Travel Class')
+    fig = px.box(ages, x='TravelClass', y='Age', color='TravelClass', title='Age Distribution by Travel Class')
     fig.update_layout(xaxis_title='Travel Class', yaxis_title='Age')
-    fig.write_image('/Users/josemarchena/Python/Project1_marchenajose/age_distribution_by_class.png')
-    fig.show()
+    target, target_format = _chart_target('age_distribution_by_class', output, as_bytes, image_format)
+    fig.write_image(target, format=target_format)
+    if show and not as_bytes:
+        fig.show()
+    return target.getvalue() if as_bytes else None
     
     ########### Bonus part
     
     # Task 6.1: Plot Travel Class Distribution as a Pie Chart
-def plot_travel_class_distribution(df):
+@instrumented
+def plot_travel_class_distribution(df, output=None, show=True, as_bytes=False, image_format='png'):
     """
     Plot the distribution of passengers across different travel classes using a pie chart.
     
     :param df: pandas DataFrame
+    :param output: str path or writable binary file object for the image (defaults to '<chart>.<image_format>' in OUTPUT_DIR)
+    :param show: bool, if False (or if as_bytes is set) the chart is only saved, not displayed
+    :param as_bytes: bool, if True return the encoded image instead of writing it anywhere
+    :param image_format: str, image format such as 'png' or 'svg'
+    :return: bytes of the encoded image if as_bytes is set, otherwise None
     """
+    _load_plotting()
     travel_class_counts = df['TravelClass'].value_counts()
     
     # Plot the pie chart
     plt.figure(figsize=(8, 8))
     plt.pie(travel_class_counts, labels=travel_class_counts.index, autopct='%1.1f%%', startangle=140, colors=sns.color_palette('pastel'))
     plt.title('Distribution of Passengers by Travel Class')
-    plt.savefig('/Users/josemarchena/Python/Project1_marchenajose/travel_class_distribution.png')
-    plt.show()
+    return _finish_figure('travel_class_distribution', output, show, as_bytes, image_format)
 
 # Task 6.2: Plot Number of Loyalty Members by Travel Class
-def plot_loyalty_members_by_class(df):
+@instrumented
+def plot_loyalty_members_by_class(df, output=None, show=True, as_bytes=False, image_format='png'):
     """
     Plot the number of loyalty members in each travel class using a bar chart.
     
     :param df: pandas DataFrame
+    :param output: str path or writable binary file object for the image (defaults to '<chart>.<image_format>' in OUTPUT_DIR)
+    :param show: bool, if False (or if as_bytes is set) the chart is only saved, not displayed
+    :param as_bytes: bool, if True return the encoded image instead of writing it anywhere
+    :param image_format: str, image format such as 'png' or 'svg'
+    :return: bytes of the encoded image if as_bytes is set, otherwise None
     """
-    loyalty_counts = df[df['LoyaltyMember']].groupby('TravelClass')['LoyaltyMember'].count()
+    _load_plotting()
+    loyalty_counts = df[df['LoyaltyMember']].groupby('TravelClass', observed=True)['LoyaltyMember'].count()
     
     # Plot the bar chart
     plt.figure(figsize=(10, 6))
@@ -218,24 +1826,27 @@ def plot_loyalty_members_by_class(df):
     plt.ylabel('Number of Loyalty Members')
     plt.xticks(rotation=45)
     plt.grid(True)
-    plt.savefig('/Users/josemarchena/Python/Project1_marchenajose/loyalty_members_by_class.png')
-    plt.show()
+    return _finish_figure('loyalty_members_by_class', output, show, as_bytes, image_format)
     
 # Task 6.3: Creating Heatmaps
    
 # Option 1: Correlation Heatmap
-def plot_correlation_heatmap(df):
+@instrumented
+def plot_correlation_heatmap(df, reference_date=None, output=None, show=True, as_bytes=False, image_format='png'):
     """
     Plot a heatmap of the correlation between different numerical variables in the dataset.
     
     :param df: pandas DataFrame
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :param output: str path or writable binary file object for the image (defaults to '<chart>.<image_format>' in OUTPUT_DIR)
+    :param show: bool, if False (or if as_bytes is set) the chart is only saved, not displayed
+    :param as_bytes: bool, if True return the encoded image instead of writing it anywhere
+    :param image_format: str, image format such as 'png' or 'svg'
+    :return: bytes of the encoded image if as_bytes is set, otherwise None
     """
-    # Calculate the current year to determine the age of passengers
-    current_year = datetime.now().year
-    df['Age'] = current_year - df['Birthdate'].dt.year
-    
-    # Select numerical columns for correlation
-    numerical_df = df[['Age', 'LoyaltyMember']]
+    _load_plotting()
+    # Select the numerical columns for correlation: the shared passenger ages and the loyalty flag
+    numerical_df = age_view(df, ['LoyaltyMember'], reference_date)
     
     # Calculate the correlation matrix
     correlation_matrix = numerical_df.corr()
@@ -244,23 +1855,32 @@ def plot_correlation_heatmap(df):
     plt.figure(figsize=(8, 6))
     sns.heatmap(correlation_matrix, annot=True, cmap='coolwarm', vmin=-1, vmax=1)
     plt.title('Correlation Heatmap')
-    plt.savefig('/Users/josemarchena/Python/Project1_marchenajose/correlation_heatmap.png')
-    plt.show()
+    return _finish_figure('correlation_heatmap', output, show, as_bytes, image_format)
 
 # Option 2: Travel Class vs. Age Heatmap
-def plot_class_age_heatmap(df):
+@instrumented
+def plot_class_age_heatmap(df, reference_date=None, output=None, show=True, as_bytes=False, image_format='png'):
     """
     Plot a heatmap of the density of different age groups within each travel class.
     
-    :param df: pandas DataFrame
+    :param df: pandas DataFrame, or a PassengerSketch to plot the heatmap from its age histograms
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :param output: str path or writable binary file object for the image (defaults to '<chart>.<image_format>' in OUTPUT_DIR)
+    :param show: bool, if False (or if as_bytes is set) the chart is only saved, not displayed
+    :param as_bytes: bool, if True return the encoded image instead of writing it anywhere
+    :param image_format: str, image format such as 'png' or 'svg'
+    :return: bytes of the encoded image if as_bytes is set, otherwise None
     """
-    # Calculate the current year to determine the age of passengers
-    current_year = datetime.now().year
-    df['Age'] = current_year - df['Birthdate'].dt.year
-    
-    # Create a pivot table for the heatmap
-    age_bins = pd.cut(df['Age'], bins=range(0, 101, 10))
-    class_age_pivot = df.pivot_table(index=age_bins, columns='TravelClass', aggfunc='size', fill_value=0)
+    _load_plotting()
+    if isinstance(df, PassengerSketch):
+        class_age_pivot = df.class_age_pivot(reference_date, bins=range(0, 101, 10))
+    else:
+        # Read the shared passenger ages next to the travel class, leaving the caller's DataFrame untouched
+        ages = age_view(df, ['TravelClass'], reference_date)
+        
+        # Count the passengers per age group and class (a grouped count needs far less memory than pivot_table)
+        age_bins = pd.cut(ages['Age'], bins=range(0, 101, 10))
+        class_age_pivot = ages.groupby([age_bins, 'TravelClass'], observed=True).size().unstack(fill_value=0)
     
     # Plot the heatmap
     plt.figure(figsize=(10, 8))
@@ -268,26 +1888,292 @@ def plot_class_age_heatmap(df):
     plt.title('Travel Class vs. Age Heatmap')
     plt.xlabel('Travel Class')
     plt.ylabel('Age Group')
-    plt.savefig('/Users/josemarchena/Python/Project1_marchenajose/class_age_heatmap.png')
-    plt.show()
+    return _finish_figure('class_age_heatmap', output, show, as_bytes, image_format)
 
 # Option 3: Travel Class vs. Flight Number Heatmap
-def plot_class_flight_heatmap(df):
+# Largest table (rows x travel classes) that is annotated with the count in every cell
+MAX_ANNOTATED_CELLS = 400
+# Default largest number of rows; only manifests with more flights have consecutive flights merged into ranges
+MAX_HEATMAP_ROWS = 200
+
+@instrumented
+def plot_class_flight_heatmap(df, output=None, show=True, as_bytes=False, image_format='png',
+                              top_n=None, by_carrier=False, max_rows=MAX_HEATMAP_ROWS):
     """
     Plot a heatmap of the density or count of passengers within each travel class for each flight number.
     
-    :param df: pandas DataFrame
-    """
-    # Create a pivot table for the heatmap
-    class_flight_pivot = df.pivot_table(index='FlightNumber', columns='TravelClass', aggfunc='size', fill_value=0)
+    The pivot is built from the sparse flight/class counts and reduced to at most max_rows rows (see
+    reduce_flight_class_counts), so the chart takes bounded time and memory whatever the number of flights.
+    Up to max_rows flights, every flight keeps its own row.
     
-    # Plot the heatmap
+    :param df: pandas DataFrame, or PassengerStatistics built from streamed chunks
+    :param output: str path or writable binary file object for the image (defaults to '<chart>.<image_format>' in OUTPUT_DIR)
+    :param show: bool, if False (or if as_bytes is set) the chart is only saved, not displayed
+    :param as_bytes: bool, if True return the encoded image instead of writing it anywhere
+    :param image_format: str, image format such as 'png' or 'svg'
+    :param top_n: int, optional number of busiest flights (or carriers) to show, the rest summed into 'Other'
+    :param by_carrier: bool, if True show one row per carrier prefix ('BA', 'AA', ...) instead of per flight
+    :param max_rows: int, maximum number of rows (defaults to MAX_HEATMAP_ROWS, None for no limit); beyond it
+                     consecutive flights are merged into ranges
+    :return: bytes of the encoded image if as_bytes is set, otherwise None
+    """
+    _load_plotting()
+    counts = flight_class_counts(df)
     plt.figure(figsize=(12, 10))
-    sns.heatmap(class_flight_pivot, annot=True, cmap='Blues')
+    if counts.empty:
+        # Nothing to pivot: draw an empty chart instead of a heatmap of an empty table
+        plt.text(0.5, 0.5, 'No passengers', ha='center', va='center')
+    else:
+        # Create a pivot table for the heatmap and plot it, annotating the cells only while they stay readable
+        class_flight_pivot = reduce_flight_class_counts(counts, top_n, by_carrier, max_rows)
+        sns.heatmap(class_flight_pivot, annot=class_flight_pivot.size <= MAX_ANNOTATED_CELLS, fmt='d', cmap='Blues')
     plt.title('Travel Class vs. Flight Number Heatmap')
     plt.xlabel('Travel Class')
-    plt.ylabel('Flight Number')
-    plt.savefig('/Users/josemarchena/Python/Project1_marchenajose/class_flight_heatmap.png')
-    plt.show()
+    plt.ylabel('Carrier' if by_carrier else 'Flight Number')
+    return _finish_figure('class_flight_heatmap', output, show, as_bytes, image_format)
+
+# Headless Batch Rendering
+# Charts that render_charts can produce: chart name -> plotting function (saved as '<chart name>.<image format>')
+CHARTS = {
+    'age_distribution': plot_age_distribution,
+    'average_age_by_class': plot_average_age_by_class,
+    'age_vs_loyalty': plot_age_vs_loyalty,
+    'age_distribution_by_class': plot_age_distribution_by_class,
+    'travel_class_distribution': plot_travel_class_distribution,
+    'loyalty_members_by_class': plot_loyalty_members_by_class,
+    'correlation_heatmap': plot_correlation_heatmap,
+    'class_age_heatmap': plot_class_age_heatmap,
+    'class_flight_heatmap': plot_class_flight_heatmap,
+}
+
+# Charts drawn with Plotly, which are written through Kaleido instead of Matplotlib
+PLOTLY_CHARTS = {'age_distribution_by_class'}
+
+# Data shared by the chart worker processes, set once per worker by _init_chart_worker
+_WORKER_DF = None
+_KALEIDO_STARTED = False
+
+def _init_chart_worker(df):
+    """
+    Prepare a chart worker process: switch Matplotlib to the non-interactive Agg backend and keep the data.
+    
+    :param df: cleaned pandas DataFrame
+    """
+    global _WORKER_DF
+    _load_plotting()
+    plt.switch_backend('Agg')
+    _WORKER_DF = df
+
+def _render_chart(chart, output=None, reference_date=None, df=None, as_bytes=False, image_format='png'):
+    """
+    Render one chart without showing it.
+    
+    :param chart: str, chart name from CHARTS
+    :param output: str path or writable binary file object for the image
+    :param reference_date: datetime.date, date at which the ages are computed, for the charts that use ages
+    :param df: pandas DataFrame, defaults to the data of the worker process
+    :param as_bytes: bool, if True return the encoded image instead of writing it
+    :param image_format: str, image format such as 'png' or 'svg'
+    :return: bytes of the encoded image if as_bytes is set, otherwise the output
+    """
+    plot_function = CHARTS[chart]
+    kwargs = {'output': output, 'show': False, 'as_bytes': as_bytes, 'image_format': image_format}
+    if reference_date is not None and 'reference_date' in inspect.signature(plot_function).parameters:
+        kwargs['reference_date'] = reference_date
+    image = plot_function(_WORKER_DF if df is None else df, **kwargs)
+    return image if as_bytes else output
+
+def _start_kaleido_session():
+    """
+    Start one persistent Kaleido renderer for all Plotly images of this process instead of one per image.
+    
+    Kaleido 1.x exposes start_sync_server for this; older releases already keep a single renderer process alive.
+    """
+    global _KALEIDO_STARTED
+    if _KALEIDO_STARTED:
+        return
+    _KALEIDO_STARTED = True
+    try:
+        import kaleido
+        kaleido.start_sync_server(silence_warnings=True)
+    except (ImportError, AttributeError):
+        pass
+
+@instrumented
+def render_charts(df, output_dir=None, charts=None, processes=None, reference_date=None, as_bytes=False, image_format='png',
+                  cache=None):
+    """
+    Render charts to image files or in-memory images without displaying them, drawing the Matplotlib charts in parallel.
+    
+    The Matplotlib charts are independent, so they are rendered in a process pool that receives the data once
+    per worker. The Plotly charts are written from this process through a single Kaleido session. With a
+    result cache, the images of charts already rendered from the same data are reused and only the others are drawn.
+    
+    :param df: cleaned pandas DataFrame
+    :param output_dir: str, directory for the image files (defaults to OUTPUT_DIR)
+    :param charts: iterable of chart names from CHARTS (defaults to all charts)
+    :param processes: int, number of worker processes (defaults to the number of CPUs)
+    :param reference_date: datetime.date, date at which the ages are computed (defaults to today)
+    :param as_bytes: bool, if True return the encoded images instead of writing files
+    :param image_format: str, image format such as 'png' or 'svg'
+    :param cache: ResultCache, optional cache of the rendered images
+    :return: dict, chart name -> path of the image file, or chart name -> image bytes if as_bytes is set
+    """
+    charts = list(CHARTS) if charts is None else list(charts)
+    unknown_charts = [chart for chart in charts if chart not in CHARTS]
+    if unknown_charts:
+        raise ValueError(f"Unknown chart(s): {unknown_charts}")
+    
+    outputs = dict.fromkeys(charts)
+    if not as_bytes:
+        output_dir = output_dir or OUTPUT_DIR
+        os.makedirs(output_dir, exist_ok=True)
+        outputs = {chart: os.path.join(output_dir, f'{chart}.{image_format}') for chart in charts}
+    if cache is None:
+        return _render_charts(df, charts, outputs, processes, reference_date, as_bytes, image_format)
+    
+    # Reuse the cached images, render the missing ones in memory and store them
+    fingerprint = dataset_fingerprint(df)
+    keys = {chart: _cache_key(cache, fingerprint, CHARTS[chart], {'image_format': image_format}, reference_date)
+            for chart in charts}
+    images = {chart: image for chart in charts if (image := cache.get(keys[chart])) is not None}
+    missing_charts = [chart for chart in charts if chart not in images]
+    if missing_charts:
+        logger.info("Rendering %d of %d chart(s) not in the result cache", len(missing_charts), len(charts))
+        rendered = _render_charts(df, missing_charts, dict.fromkeys(missing_charts), processes, reference_date, True, image_format)
+        for chart, image in rendered.items():
+            cache.put(keys[chart], image)
+            images[chart] = image
+    
+    if as_bytes:
+        return {chart: images[chart] for chart in charts}
+    for chart in charts:
+        with open(outputs[chart], 'wb') as file:
+            file.write(images[chart])
+    return outputs
+
+def _render_charts(df, charts, outputs, processes, reference_date, as_bytes, image_format):
+    """
+    Render charts (see render_charts) to the given outputs.
+    
+    :return: dict, chart name -> output, or chart name -> image bytes if as_bytes is set
+    """
+    render = partial(_render_chart, reference_date=reference_date, as_bytes=as_bytes, image_format=image_format)
+    matplotlib_charts = [chart for chart in charts if chart not in PLOTLY_CHARTS]
+    
+    results = {}
+    if processes == 1 or len(matplotlib_charts) <= 1:
+        for chart in matplotlib_charts:
+            results[chart] = render(chart, outputs[chart], df=df)
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_chart_worker, initargs=(df,)) as executor:
+            futures = {chart: executor.submit(render, chart, outputs[chart]) for chart in matplotlib_charts}
+            results = {chart: future.result() for chart, future in futures.items()}
+    
+    for chart in charts:
+        if chart in PLOTLY_CHARTS:
+            _start_kaleido_session()
+            results[chart] = render(chart, outputs[chart], df=df)
+    
+    return {chart: results[chart] for chart in charts}
+
+# Result Cache: Reuse Statistics, Pivots and Charts Computed from the Same Data
+# Fingerprints already computed per DataFrame: id(df) -> (index, column names, columns, fingerprint)
+_FINGERPRINT_CACHE = {}
+
+def dataset_fingerprint(df):
+    """
+    Compute a fingerprint of the content of a DataFrame: its column names, types and the hash of every row.
+    
+    The fingerprint is kept until the DataFrame is garbage collected. Like passenger_ages, the cache entry is
+    checked against the index and every column on each call, so the fingerprint is computed again after the
+    DataFrame is edited in place.
+    
+    :param df: pandas DataFrame
+    :return: str, hexadecimal SHA-256 digest
+    """
+    columns = [df.iloc[:, position] for position in range(df.shape[1])]
+    cached = _FINGERPRINT_CACHE.get(id(df))
+    if cached is not None:
+        index, column_names, cached_columns, fingerprint = cached
+        if index is df.index and column_names is df.columns and _columns_unchanged(columns, cached_columns):
+            return fingerprint
+    
+    digest = hashlib.sha256(json.dumps([[str(column), str(dtype)] for column, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    fingerprint = digest.hexdigest()
     
-    
\ No newline at end of file
+    if cached is None:
+        weakref.finalize(df, _FINGERPRINT_CACHE.pop, id(df), None)
+    _FINGERPRINT_CACHE[id(df)] = (df.index, df.columns, columns, fingerprint)
+    return fingerprint
+
+def _cache_key(cache, fingerprint, function, params, reference_date):
+    """
+    Build the result cache key of a call, including the reference date only for functions that compute ages.
+    """
+    if 'reference_date' in inspect.signature(function).parameters:
+        reference_date = reference_date or date.today()
+    else:
+        reference_date = None
+    return cache.key(fingerprint, function.__name__, params, reference_date)
+
+def _json_default(value):
+    """
+    Convert NumPy numbers (and anything else JSON does not know) for json.dumps.
+    """
+    return value.item() if hasattr(value, 'item') else str(value)
+
+def _encode_result(result):
+    """
+    Encode a result for the result cache: bytes as they are, DataFrames (such as pivots) and other values as JSON.
+    
+    :param result: bytes, pandas DataFrame with a flat index and columns, or a JSON-serializable value
+    :return: bytes, the kind of result on the first line followed by the payload
+    """
+    if isinstance(result, bytes):
+        return b'bytes\n' + result
+    if isinstance(result, pd.DataFrame):
+        payload = {'index': result.index.tolist(), 'index_name': result.index.name, 'columns': result.columns.tolist(),
+                   'columns_name': result.columns.name, 'data': result.to_numpy().tolist()}
+        return b'frame\n' + json.dumps(payload, default=_json_default).encode()
+    return b'json\n' + json.dumps(result, default=_json_default).encode()
+
+def _decode_result(data):
+    """
+    Decode a result written by _encode_result.
+    """
+    kind, _, payload = data.partition(b'\n')
+    if kind == b'bytes':
+        return payload
+    value = json.loads(payload)
+    if kind == b'frame':
+        return pd.DataFrame(value['data'], index=pd.Index(value['index'], name=value['index_name']),
+                            columns=pd.Index(value['columns'], name=value['columns_name']))
+    return value
+
+def cached_call(cache, function, df, **kwargs):
+    """
+    Call an analysis function, or return its result from the cache when it was computed from the same data before.
+    
+    The result is keyed by the fingerprint of the data, the name of the function, the keyword arguments and, for
+    functions that compute ages, the reference date (today when not given). Results come back as they are
+    stored, whether they were cached or just computed: dictionaries and DataFrames through JSON (NumPy numbers
+    become Python numbers, categorical axes plain ones), images as bytes.
+    
+    :param cache: ResultCache, or None to simply call the function
+    :param function: callable taking the DataFrame as first argument, e.g. get_class_statistics or a plot with as_bytes=True
+    :param df: cleaned pandas DataFrame
+    :param kwargs: keyword arguments of the function (JSON-serializable)
+    :return: the result of the function
+    """
+    if cache is None:
+        return function(df, **kwargs)
+    params = {name: value for name, value in kwargs.items() if name != 'reference_date'}
+    key = _cache_key(cache, dataset_fingerprint(df), function, params, kwargs.get('reference_date'))
+    data = cache.get(key)
+    if data is not None:
+        return _decode_result(data)
+    data = _encode_result(function(df, **kwargs))
+    cache.put(key, data)
+    return _decode_result(data)
@@ -0,0 +1,154 @@
+# Content-addressed on-disk cache of computed results (statistics, pivots, rendered charts) used by passenger_analysis.py
+
+import hashlib
+import json
+import os
+import time
+from datetime import date, datetime
+
+
+class ResultCache:
+    """
+    Directory of cached results, each stored as one file named after the hash of its key.
+
+    A key combines the fingerprint of the dataset, the name of the function, its parameters and the reference
+    date, so a result is reused only for exactly the same inputs and a changed dataset simply misses. Reading
+    an entry refreshes its modification time; when the files exceed max_bytes the least recently used ones are
+    deleted first. Entries are written to a temporary file and renamed, so concurrent runs never read a
+    half-written result.
+    """
+
+    SUFFIX = '.result'
+
+    def __init__(self, cache_dir, max_bytes=256 * 2 ** 20):
+        """
+        :param cache_dir: str, directory of the cache files (created when needed)
+        :param max_bytes: int, largest total size of the cached results before the least recently used are evicted
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(fingerprint, function, params=None, reference_date=None):
+        """
+        Build the key of a result.
+
+        :param fingerprint: str, fingerprint of the dataset the result was computed from
+        :param function: str, name of the function that computed the result
+        :param params: dict, parameters of the call that affect the result (JSON-serializable)
+        :param reference_date: datetime.date, date at which the ages were computed, or None when not used
+        :return: str, hexadecimal SHA-256 digest
+        """
+        if isinstance(reference_date, datetime):
+            reference_date = reference_date.date()
+        description = {
+            'fingerprint': fingerprint,
+            'function': function,
+            'params': params or {},
+            'reference_date': reference_date.isoformat() if isinstance(reference_date, date) else reference_date,
+        }
+        text = json.dumps(description, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.SUFFIX)
+
+    @staticmethod
+    def _touch(path):
+        # Set the time explicitly: the file system's own timestamps can be too coarse to order quick accesses
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def get(self, key):
+        """
+        Read a cached result and mark it as recently used.
+
+        :param key: str, key from ResultCache.key
+        :return: bytes, or None when the result is not cached
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+            self._touch(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """
+        Store a result, then evict the least recently used results if the cache grew beyond max_bytes.
+
+        :param key: str, key from ResultCache.key
+        :param data: bytes, encoded result
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(data)
+        self._touch(tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def entries(self):
+        """
+        List the cached results, least recently used first.
+
+        :return: list of tuples (path, size in bytes, last use time)
+        """
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            if name.endswith(self.SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # Evicted by another process meanwhile
+                entries.append((path, stat.st_size, stat.st_mtime_ns))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    @property
+    def size(self):
+        """
+        Total size in bytes of the cached results.
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Delete the least recently used results until the cache fits in max_bytes.
+
+        :return: int, number of results deleted
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        """
+        Delete every cached result.
+        """
+        for path, _, _ in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
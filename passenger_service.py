@@ -0,0 +1,269 @@
+# Local HTTP service that keeps the cleaned passenger data in memory and serves the statistics as JSON
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import date, datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from passenger_analysis import load_cached_data, calculate_average_age, find_loyalty_members, get_class_statistics, PassengerIndex
+
+logger = logging.getLogger(__name__)
+
+
+class PassengerService:
+    """
+    Statistics of one manifest file served from memory, with cached JSON responses.
+
+    The file is loaded and cleaned once (through the binary cache of load_cached_data). A background task
+    checks the file's size and modification time and reloads it in a worker thread when it changes; the
+    new data replaces the old one only once it is fully cleaned, and the response cache is cleared with it.
+    The response cache keeps the max_responses most recently used responses, keyed only by the query
+    parameters the endpoint reads, so unknown parameters cannot fill it.
+
+    Endpoints (GET, JSON):
+    - /class-statistics?metrics=<metric>&metrics=...&reference_date=YYYY-MM-DD
+    - /loyalty-members[?flight=<flight>&travel_class=<class>]
+    - /average-age?travel_class=<class>[&flight=<flight>&reference_date=YYYY-MM-DD]
+    - /flight-class-pivot
+    - /health
+    """
+
+    def __init__(self, file_path, poll_interval=2.0, cache_dir=None, max_responses=1024):
+        """
+        :param file_path: str, path to the manifest CSV file
+        :param poll_interval: float, seconds between checks of the file for changes
+        :param cache_dir: str, optional directory for the binary cache (see load_cached_data)
+        :param max_responses: int, number of responses kept in the response cache, least recently used evicted first
+        """
+        self.file_path = file_path
+        self.poll_interval = poll_interval
+        self.cache_dir = cache_dir
+        self.max_responses = max_responses
+        self.df = None
+        self.index = None
+        self.loaded_at = None
+        self.version = 0
+        self._file_state = None
+        self._responses = OrderedDict()  # (path, date, query values read by the endpoint) -> encoded JSON body, oldest first
+        # Path -> (endpoint, query parameters it reads, or None for responses that are never cached)
+        self._routes = {
+            '/class-statistics': (self._class_statistics, ('metrics', 'reference_date')),
+            '/loyalty-members': (self._loyalty_members, ('flight', 'travel_class')),
+            '/average-age': (self._average_age, ('travel_class', 'flight', 'reference_date')),
+            '/flight-class-pivot': (self._flight_class_pivot, ()),
+            '/health': (self._health, None),
+        }
+
+    def _stat(self):
+        """
+        Size and modification time of the file, which change whenever it is rewritten.
+        """
+        stat = os.stat(self.file_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    async def load(self):
+        """
+        Load and clean the file in a worker thread, then swap in the new data and clear the response cache.
+        """
+        file_state = self._stat()
+        df = await asyncio.to_thread(load_cached_data, self.file_path, self.cache_dir)
+        index = await asyncio.to_thread(PassengerIndex, df)
+        self.df, self.index, self._file_state = df, index, file_state
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+        self.version += 1
+        self._responses.clear()
+        logger.info("Loaded %d passengers from %s (version %d)", len(df), self.file_path, self.version)
+
+    async def check_for_changes(self):
+        """
+        Reload the file if its size or modification time changed since it was loaded.
+
+        :return: bool, whether the file was reloaded
+        """
+        try:
+            changed = self._stat() != self._file_state
+        except OSError:
+            # The file is being replaced; keep serving the current data and look again later
+            return False
+        if changed:
+            await self.load()
+        return changed
+
+    async def watch(self):
+        """
+        Check the file for changes every poll_interval seconds, keeping the current data when a reload fails.
+        """
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.check_for_changes()
+            except Exception:
+                logger.exception("Reloading %s failed; serving the previous data", self.file_path)
+
+    # Endpoints: each takes the data and index loaded when the request arrived (a reload may swap them meanwhile)
+    # and the parsed query, and returns a JSON-serializable value
+    def _class_statistics(self, df, index, query):
+        metrics = query.get('metrics', ['Average Age', 'Loyalty Members'])
+        return get_class_statistics(df, metrics, _reference_date(query))
+
+    def _loyalty_members(self, df, index, query):
+        if 'flight' in query or 'travel_class' in query:
+            return index.loyalty_members(flight=_single(query, 'flight'), travel_class=_single(query, 'travel_class'))
+        return find_loyalty_members(df)
+
+    def _average_age(self, df, index, query):
+        travel_class = _single(query, 'travel_class')
+        if travel_class is None:
+            raise ValueError("travel_class is required")
+        if 'flight' in query:
+            df = df.iloc[index.positions(flight=_single(query, 'flight'), travel_class=travel_class)]
+        average_age = calculate_average_age(df, travel_class, _reference_date(query))
+        return {'travel_class': travel_class, 'average_age': None if average_age != average_age else float(average_age)}
+
+    def _flight_class_pivot(self, df, index, query):
+        pivot = df.pivot_table(index='FlightNumber', columns='TravelClass', aggfunc='size', fill_value=0, observed=True)
+        return {str(flight): {str(travel_class): int(count) for travel_class, count in counts.items()}
+                for flight, counts in pivot.iterrows()}
+
+    def _health(self, df, index, query):
+        return {'file': self.file_path, 'passengers': len(df), 'loaded_at': self.loaded_at, 'version': self.version}
+
+    async def respond(self, target):
+        """
+        Answer a GET request, from the response cache when the same query was already answered for this data.
+
+        :param target: str, request target such as '/average-age?travel_class=ECONOMY'
+        :return: tuple (HTTPStatus, encoded JSON body)
+        """
+        url = urlsplit(target)
+        path = url.path.rstrip('/') or '/'
+        route = self._routes.get(path)
+        if route is None:
+            return HTTPStatus.NOT_FOUND, _json_body({'error': f"Unknown endpoint {url.path}", 'endpoints': list(self._routes)})
+        endpoint, parameters = route
+        query = parse_qs(url.query)
+        
+        key = None
+        if parameters is not None:
+            # Ages default to today's date, so the day is part of the key; other parameters are ignored by the endpoint
+            key = (path, date.today(), tuple((name, tuple(query[name])) for name in parameters if name in query))
+            body = self._responses.get(key)
+            if body is not None:
+                self._responses.move_to_end(key)
+                return HTTPStatus.OK, body
+        
+        version = self.version
+        try:
+            # Run the computation in a worker thread so a slow query does not hold up the other clients
+            body = _json_body(await asyncio.to_thread(endpoint, self.df, self.index, query))
+        except (KeyError, ValueError) as error:
+            return HTTPStatus.BAD_REQUEST, _json_body({'error': str(error)})
+        if key is not None and version == self.version:
+            self._responses[key] = body
+            while len(self._responses) > self.max_responses:
+                self._responses.popitem(last=False)
+        return HTTPStatus.OK, body
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve the HTTP/1.1 requests of one client connection, keeping it open between requests unless asked to close.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get('content-length', 0)):
+                    await reader.readexactly(int(headers['content-length']))
+
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    status, body = HTTPStatus.BAD_REQUEST, _json_body({'error': 'Malformed request line'})
+                elif parts[0] not in ('GET', 'HEAD'):
+                    status, body = HTTPStatus.METHOD_NOT_ALLOWED, _json_body({'error': 'Only GET is supported'})
+                else:
+                    status, body = await self.respond(parts[1])
+
+                keep_alive = len(parts) == 3 and parts[2] == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1'))
+                if parts[0] != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        """
+        Load the data, then serve requests and watch the file until cancelled.
+
+        :param host: str, address to listen on
+        :param port: int, port to listen on (0 picks a free port)
+        """
+        await self.load()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        watcher = asyncio.create_task(self.watch())
+        address = server.sockets[0].getsockname()
+        logger.info("Serving passenger statistics on http://%s:%d", address[0], address[1])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+def _single(query, name):
+    """
+    Get the last value of a query parameter, or None when it is missing.
+    """
+    values = query.get(name)
+    return values[-1] if values else None
+
+def _reference_date(query):
+    """
+    Parse the optional reference_date query parameter (YYYY-MM-DD).
+    """
+    value = _single(query, 'reference_date')
+    return date.fromisoformat(value) if value else None
+
+def _json_body(value):
+    """
+    Encode a response value as JSON, converting NumPy numbers to Python numbers.
+    """
+    return json.dumps(value, default=lambda item: item.item() if hasattr(item, 'item') else str(item)).encode()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve passenger statistics as JSON over HTTP.')
+    parser.add_argument('file_path', nargs='?', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'passengers.csv'),
+                        help='manifest CSV file (defaults to passengers.csv next to this script)')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='seconds between checks of the file for changes')
+    parser.add_argument('--max-responses', type=int, default=1024, help='number of responses kept in the response cache')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(PassengerService(args.file_path, args.poll_interval, max_responses=args.max_responses).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
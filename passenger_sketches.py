@@ -0,0 +1,246 @@
+# Mergeable fixed-memory sketches used by the approximate statistics mode of passenger_analysis.py
+
+import math
+import numpy as np
+import pandas as pd
+
+
+def _hash64(values, seed=0):
+    """
+    Hash values to unsigned 64-bit integers in a vectorized way.
+
+    :param values: array-like of numbers or strings
+    :param seed: int, selects an independent hash function
+    :return: numpy array of uint64
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'USO':
+        values = values.astype(object)
+    return pd.util.hash_array(values, hash_key=f'{seed:016d}'[-16:], categorize=False)
+
+
+class HistogramSketch:
+    """
+    Fixed-width histogram of numeric values over a known range, usable as a streaming quantile digest.
+
+    Memory is one counter per bin whatever the number of values. Counts are exact; quantiles and the mean
+    are off by at most one bin width, (high - low) / bins. With integer values and bins of width 1
+    (the default for birth years) the mean and the quantiles are exact. Values outside [low, high) are
+    clipped into the first or last bin. Sketches with the same range and bins merge by adding counts.
+    """
+
+    def __init__(self, low, high, bins):
+        """
+        :param low: float, lower edge of the first bin
+        :param high: float, upper edge of the last bin
+        :param bins: int, number of bins
+        """
+        self.low, self.high, self.bins = low, high, bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    @property
+    def width(self):
+        """
+        Width of one bin, which is also the error bound of the quantiles and the mean.
+        """
+        return (self.high - self.low) / self.bins
+
+    @property
+    def count(self):
+        """
+        Number of values added.
+        """
+        return int(self.counts.sum())
+
+    def update(self, values):
+        """
+        Add values to the histogram.
+
+        :param values: array-like of numbers
+        """
+        positions = np.floor((np.asarray(values, dtype=float) - self.low) / self.width).astype(np.int64)
+        self.counts += np.bincount(np.clip(positions, 0, self.bins - 1), minlength=self.bins)
+
+    def merge(self, other):
+        """
+        Add the counts of another histogram with the same range and bins.
+
+        :param other: HistogramSketch
+        :return: self
+        """
+        if (other.low, other.high, other.bins) != (self.low, self.high, self.bins):
+            raise ValueError("Only histograms with the same range and bins can be merged")
+        self.counts += other.counts
+        return self
+
+    def bin_values(self):
+        """
+        Representative value of every bin: its lower edge, which is the exact value for integer data in width-1 bins.
+
+        :return: numpy array of floats
+        """
+        return self.low + self.width * np.arange(self.bins)
+
+    def mean(self):
+        """
+        Mean of the values added (NaN when empty).
+        """
+        count = self.count
+        return float(np.dot(self.counts, self.bin_values()) / count) if count else float('nan')
+
+    def quantile(self, q):
+        """
+        Nearest-rank quantile: the smallest value with at least a fraction q of the values at or below it (NaN when empty).
+
+        :param q: float between 0 and 1 (0 gives the minimum, 1 the maximum)
+        :return: float
+        """
+        count = self.count
+        if not count:
+            return float('nan')
+        rank = max(int(np.ceil(q * count)), 1)
+        position = int(np.searchsorted(np.cumsum(self.counts), rank, side='left'))
+        return float(self.bin_values()[min(position, self.bins - 1)])
+
+
+class CountMinSketch:
+    """
+    Count-min sketch: approximate counts per key in a fixed table of depth x width counters.
+
+    Estimates never undercount. With width = ceil(e / epsilon) and depth = ceil(ln(1 / delta)), an estimate
+    exceeds the true count by more than epsilon * total with probability at most delta; the defaults
+    (width 2048, depth 5) give epsilon ~ 0.13% of the total count with delta < 0.7%. Sketches with the same
+    shape and seed merge by adding their tables.
+    """
+
+    def __init__(self, width=2048, depth=5, seed=0):
+        """
+        :param width: int, counters per row
+        :param depth: int, number of rows (independent hash functions)
+        :param seed: int, hash seed; only sketches with the same seed can be merged
+        """
+        self.width, self.depth, self.seed = width, depth, seed
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    @classmethod
+    def from_error(cls, epsilon, delta, seed=0):
+        """
+        Create a sketch sized for an additive error of epsilon * total with probability 1 - delta.
+        """
+        return cls(width=math.ceil(math.e / epsilon), depth=math.ceil(math.log(1 / delta)), seed=seed)
+
+    def _columns(self, keys):
+        """
+        Column of every key in every row, using double hashing (h1 + i * h2).
+        """
+        first = _hash64(keys, self.seed)
+        second = _hash64(keys, self.seed + 1) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((first[None, :] + rows * second[None, :]) % np.uint64(self.width)).astype(np.int64)
+
+    def update(self, keys, counts=None):
+        """
+        Add counts for keys.
+
+        :param keys: array-like of keys (strings or numbers)
+        :param counts: array-like of int, count of every key (defaults to 1 each)
+        """
+        keys = np.asarray(keys)
+        counts = np.ones(len(keys), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        columns = self._columns(keys)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], counts)
+        self.total += int(counts.sum())
+
+    def estimate(self, keys):
+        """
+        Estimated counts of keys (never below the true counts).
+
+        :param keys: array-like of keys
+        :return: numpy array of int
+        """
+        columns = self._columns(np.asarray(keys))
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+    def merge(self, other):
+        """
+        Add the counts of another sketch with the same shape and seed.
+
+        :param other: CountMinSketch
+        :return: self
+        """
+        if (other.width, other.depth, other.seed) != (self.width, self.depth, self.seed):
+            raise ValueError("Only count-min sketches with the same width, depth and seed can be merged")
+        self.table += other.table
+        self.total += other.total
+        return self
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count estimator using 2**precision one-byte registers.
+
+    The relative standard error is about 1.04 / sqrt(2**precision), i.e. 0.81% with the default precision 14
+    (16 KiB of registers). Sketches with the same precision and seed merge by taking the register maxima.
+    """
+
+    def __init__(self, precision=14, seed=0):
+        """
+        :param precision: int, number of index bits (4 to 18)
+        :param seed: int, hash seed; only sketches with the same seed can be merged
+        """
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision, self.seed = precision, seed
+        self.registers = np.zeros(2 ** precision, dtype=np.uint8)
+
+    def update(self, values):
+        """
+        Add values (duplicates do not change the estimate).
+
+        :param values: array-like of numbers or strings
+        """
+        hashes = _hash64(values, self.seed)
+        value_bits = 64 - self.precision
+        indexes = (hashes >> np.uint64(value_bits)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << value_bits) - 1)
+
+        # Bit length of the remainder, by binary search over the shift amounts
+        bit_length = np.zeros(len(remainder), dtype=np.int64)
+        for shift in (32, 16, 8, 4, 2, 1):
+            large = remainder >= np.uint64(1 << shift)
+            bit_length[large] += shift
+            remainder[large] >>= np.uint64(shift)
+        bit_length += (remainder > 0)
+
+        # Position of the leftmost 1-bit in the remaining value bits
+        ranks = (value_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, indexes, ranks)
+
+    def estimate(self):
+        """
+        Estimated number of distinct values added.
+
+        :return: float
+        """
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw_estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(float)))
+        empty_registers = int(np.count_nonzero(self.registers == 0))
+        if raw_estimate <= 2.5 * m and empty_registers:
+            # Linear counting is more accurate for small cardinalities
+            return m * math.log(m / empty_registers)
+        return float(raw_estimate)
+
+    def merge(self, other):
+        """
+        Combine with another sketch with the same precision and seed.
+
+        :param other: HyperLogLog
+        :return: self
+        """
+        if (other.precision, other.seed) != (self.precision, self.seed):
+            raise ValueError("Only HyperLogLog sketches with the same precision and seed can be merged")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
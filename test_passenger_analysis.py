@@ -1,14 +1,39 @@
 # Task 7: Implement unit tests for functions from passenger_analysis.py 
 
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import date, datetime
 import logging
-from passenger_analysis import load_data, clean_data, calculate_average_age, find_loyalty_members, get_class_statistics
+import passenger_analysis
+from benchmark_passengers import generate_manifest
+from marchenj_passengers import main as run_command_line
+from passenger_service import PassengerService
+from passenger_analysis import load_data, clean_data, calculate_average_age, find_loyalty_members, get_class_statistics, iter_clean_data, summarize_chunks, CLASS_METRICS, load_cached_data, passenger_ages, load_many, summarize_many, PassengerStatistics, render_charts, CHARTS, PLOTLY_CHARTS, plot_age_distribution, PassengerIndex, enable_instrumentation, disable_instrumentation, detect_date_format, parse_birthdates, PassengerSketch, plot_class_age_heatmap, flight_class_counts, reduce_flight_class_counts, plot_class_flight_heatmap, validate_passengers, VALIDATION_RULES, TRAVEL_CLASSES, age_view, aggregate_class_metrics, plot_average_age_by_class, plot_age_vs_loyalty, plot_correlation_heatmap, cached_call, class_flight_pivot, dataset_fingerprint, PartitionedStatistics, summarize_partitions, travel_date_from_path, TREND_METRICS
+from passenger_cache import ResultCache
+from passenger_sketches import HyperLogLog
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def write_raw_manifest(df, file_path):
+    """
+    Write a DataFrame in the raw manifest format (row count header, M/D/YYYY dates, TRUE/FALSE flags).
+    """
+    raw_df = df.copy()
+    raw_df['Birthdate'] = raw_df['Birthdate'].dt.strftime('%m/%d/%Y')
+    raw_df['LoyaltyMember'] = raw_df['LoyaltyMember'].map({True: 'TRUE', False: 'FALSE'})
+    with open(file_path, 'w') as file:
+        file.write(f"{len(raw_df)}\n")
+        raw_df.to_csv(file, header=False, index=False)
+
 class TestPassengerAnalysis(unittest.TestCase):
 
     @classmethod
@@ -52,6 +77,176 @@ class TestPassengerAnalysis(unittest.TestCase):
         self.assertListEqual(list(self.df.columns), expected_columns)
         logging.info("load_data function test passed.")
 
+    def test_load_data_schema(self):
+        """
+        Test that load_data and clean_data produce the compact column types of the passenger schema.
+        """
+        logging.info("Testing load_data and clean_data column types...")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'passengers.csv')
+            write_raw_manifest(self.df, file_path)
+            cleaned_df = clean_data(load_data(file_path))
+        
+        # Check the categorical, boolean and compact integer columns
+        self.assertIsInstance(cleaned_df['TravelClass'].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(cleaned_df['FlightNumber'].dtype, pd.CategoricalDtype)
+        self.assertTrue(pd.api.types.is_bool_dtype(cleaned_df['LoyaltyMember']))
+        self.assertEqual(cleaned_df['BirthYear'].dtype, 'int16')
+        
+        # Check that the values survive the conversion
+        self.assertListEqual(cleaned_df['LoyaltyMember'].tolist(), self.df['LoyaltyMember'].tolist())
+        self.assertListEqual(cleaned_df['TravelClass'].astype(str).tolist(), self.df['TravelClass'].tolist())
+        self.assertListEqual(cleaned_df['BirthYear'].tolist(), self.df['Birthdate'].dt.year.tolist())
+        logging.info("load_data and clean_data column types test passed.")
+
+    def test_passenger_statistics(self):
+        """
+        Test that PassengerStatistics stays equal to a full recomputation when batches are added and removed.
+        """
+        logging.info("Testing PassengerStatistics class...")
+        
+        # Add the passengers in three batches and retract the middle one
+        statistics = PassengerStatistics(track_members=True)
+        statistics.add(self.df.iloc[:2]).add(self.df.iloc[2:4]).add(self.df.iloc[4:])
+        statistics.remove(self.df.iloc[2:4])
+        remaining_df = pd.concat([self.df.iloc[:2], self.df.iloc[4:]])
+        
+        # Verify the running statistics against the full recomputation on the remaining passengers
+        self.assertDictEqual(statistics.class_statistics(), get_class_statistics(remaining_df))
+        self.assertEqual(statistics.loyalty_count, 2)
+        self.assertListEqual(statistics.loyalty_members(), find_loyalty_members(remaining_df))
+        expected_pivot = remaining_df.pivot_table(index='FlightNumber', columns='TravelClass', aggfunc='size', fill_value=0)
+        pd.testing.assert_frame_equal(statistics.class_flight_pivot(), expected_pivot)
+        
+        # The retracted ECONOMY passengers must be gone completely
+        self.assertNotIn('ECONOMY', statistics.class_statistics())
+        logging.info("PassengerStatistics class test passed.")
+
+    def test_reduce_flight_class_counts(self):
+        """
+        Test the carrier grouping, top-N selection and row merging of the bounded flight/class pivot.
+        """
+        logging.info("Testing reduce_flight_class_counts function...")
+        counts = flight_class_counts(self.df)
+        
+        # Without reductions the pivot matches pivot_table
+        expected_pivot = self.df.pivot_table(index='FlightNumber', columns='TravelClass', aggfunc='size', fill_value=0)
+        pd.testing.assert_frame_equal(reduce_flight_class_counts(counts), expected_pivot)
+        
+        # Carriers: BA has two flights; with top_n=1 the other carriers are summed into 'Other'
+        by_carrier = reduce_flight_class_counts(counts, by_carrier=True)
+        self.assertListEqual(by_carrier.index.tolist(), ['AA', 'BA', 'LA', 'UA'])
+        self.assertEqual(by_carrier.loc['BA'].sum(), 2)
+        top_carrier = reduce_flight_class_counts(counts, top_n=1, by_carrier=True)
+        self.assertListEqual(top_carrier.index.tolist(), ['BA', 'Other'])
+        self.assertEqual(top_carrier.loc['Other'].sum(), 3)
+        
+        # Five flights merged into at most two rows of consecutive flights, from a streamed counter
+        statistics = PassengerStatistics().add(self.df)
+        merged = statistics.class_flight_pivot(max_rows=2)
+        self.assertListEqual(merged.index.tolist(), ['AA110..BA255', 'LA249..UA100'])
+        self.assertEqual(merged.to_numpy().sum(), len(self.df))
+        self.assertTrue(plot_class_flight_heatmap(statistics, show=False, as_bytes=True, max_rows=2).startswith(b'\x89PNG'))
+        self.assertTrue(plot_class_flight_heatmap(PassengerStatistics(), show=False, as_bytes=True).startswith(b'\x89PNG'))
+        logging.info("reduce_flight_class_counts function test passed.")
+
+    def test_passenger_sketch(self):
+        """
+        Test that merged PassengerSketch shards give the exact class statistics and bounded flight and distinct counts.
+        """
+        logging.info("Testing PassengerSketch class...")
+        reference_date = date(2024, 6, 1)
+        sketch = PassengerSketch().add(self.df.iloc[:2]).merge(PassengerSketch().add(self.df.iloc[2:]))
+        
+        # Year-based age statistics are exact with one histogram bin per birth year
+        metrics = list(CLASS_METRICS)
+        expected_stats = get_class_statistics(self.df, metrics, reference_date)
+        approximate_stats = get_class_statistics(sketch, metrics, reference_date)
+        self.assertSetEqual(set(approximate_stats), set(expected_stats))
+        for travel_class, stats in expected_stats.items():
+            for metric in ['Average Age', 'Loyalty Members', 'Passengers', 'Min Age', 'Max Age', 'Loyalty Share']:
+                self.assertAlmostEqual(approximate_stats[travel_class][metric], stats[metric])
+        
+        # Count-min estimates never undercount and stay exact for so few keys
+        self.assertEqual(sketch.flight_class_count('BA255', 'ECONOMY'), 1)
+        self.assertEqual(sketch.flight_class_count('BA255', 'BUSINESS'), 0)
+        self.assertEqual(sketch.distinct_passengers(), 5)
+        self.assertEqual(int(sketch.age_counts(reference_date).sum()), 5)
+        self.assertEqual(int(sketch.class_age_pivot(reference_date).to_numpy().sum()), 4)  # the 121-year-old is outside the age groups
+        
+        # Distinct counts stay within a few standard errors (0.81%) on a larger set
+        distinct_ids = HyperLogLog()
+        distinct_ids.update(range(100_000))
+        distinct_ids.update(range(50_000))
+        self.assertAlmostEqual(distinct_ids.estimate() / 100_000, 1, delta=0.03)
+        
+        # The approximate charts are drawn from the sketch alone
+        self.assertTrue(plot_age_distribution(sketch, reference_date, show=False, as_bytes=True).startswith(b'\x89PNG'))
+        self.assertTrue(plot_class_age_heatmap(sketch, reference_date, show=False, as_bytes=True).startswith(b'\x89PNG'))
+        logging.info("PassengerSketch class test passed.")
+
+    def test_load_many(self):
+        """
+        Test that load_many and summarize_many combine several manifest files processed in parallel.
+        """
+        logging.info("Testing load_many and summarize_many functions...")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Split the sample data over two manifest files
+            write_raw_manifest(self.df.iloc[:3], os.path.join(tmp_dir, 'manifest_1.csv'))
+            write_raw_manifest(self.df.iloc[3:], os.path.join(tmp_dir, 'manifest_2.csv'))
+            
+            combined_df = load_many(tmp_dir, processes=2)
+            stats, loyalty_count, class_flight_pivot = summarize_many(os.path.join(tmp_dir, 'manifest_*.csv'), processes=2)
+        
+        # Verify the combined data and the merged aggregates against the in-memory results
+        self.assertListEqual(combined_df['PassengerID'].tolist(), self.df['PassengerID'].tolist())
+        self.assertIsInstance(combined_df['TravelClass'].dtype, pd.CategoricalDtype)
+        expected_stats = get_class_statistics(self.df)
+        for travel_class, expected in expected_stats.items():
+            self.assertAlmostEqual(stats[travel_class]['Average Age'], expected['Average Age'])
+            self.assertEqual(stats[travel_class]['Loyalty Members'], expected['Loyalty Members'])
+        self.assertEqual(loyalty_count, 3)
+        self.assertEqual(class_flight_pivot.values.sum(), len(self.df))
+        logging.info("load_many and summarize_many function test passed.")
+
+    def test_load_cached_data(self):
+        """
+        Test that load_cached_data reuses its binary cache and rebuilds it when the CSV file changes.
+        """
+        logging.info("Testing load_cached_data function...")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'passengers.csv')
+            write_raw_manifest(self.df, file_path)
+            
+            # The first call cleans the CSV file and writes the cache next to it
+            first_df = load_cached_data(file_path)
+            self.assertTrue(os.path.exists(file_path + '.cache.npz'))
+            
+            # The second call must return the same data and column types from the cache
+            pd.testing.assert_frame_equal(load_cached_data(file_path), first_df)
+            
+            # Touching the CSV file without changing it keeps the cache and records the new modification time
+            os.utime(file_path, ns=(0, 0))
+            pd.testing.assert_frame_equal(load_cached_data(file_path), first_df)
+            with np.load(file_path + '.cache.npz') as cache:
+                meta = json.loads(cache['__meta__'].item())
+            self.assertEqual(meta['source']['mtime_ns'], 0)
+            self.assertEqual(meta['version'], passenger_analysis.CACHE_VERSION)
+            
+            # A cache written by another version (e.g. before a change of the cleaning rules) is rebuilt
+            cache_mtime = os.stat(file_path + '.cache.npz').st_mtime_ns
+            passenger_analysis.CACHE_VERSION += 1
+            try:
+                pd.testing.assert_frame_equal(load_cached_data(file_path), first_df)
+            finally:
+                passenger_analysis.CACHE_VERSION -= 1
+            self.assertNotEqual(os.stat(file_path + '.cache.npz').st_mtime_ns, cache_mtime)
+            
+            # Changing the CSV file must invalidate the cache
+            write_raw_manifest(self.df.head(3), file_path)
+            self.assertEqual(len(load_cached_data(file_path)), 3)
+        logging.info("load_cached_data function test passed.")
+
     def test_clean_data(self):
         """
         Test the clean_data function to ensure it handles missing values and data types correctly.
@@ -70,6 +265,84 @@ class TestPassengerAnalysis(unittest.TestCase):
         self.assertTrue(pd.api.types.is_bool_dtype(cleaned_df['LoyaltyMember']))
         logging.info("clean_data function test passed.")
 
+    def test_parse_birthdates(self):
+        """
+        Test the date format detection, the parsing of distinct values and the report of rejected rows.
+        """
+        logging.info("Testing parse_birthdates function and clean_data rejected rows...")
+        
+        # Detect the format once and parse categorical and plain string columns alike
+        us_dates = pd.Series(['5/21/1987', '11/12/1980', '5/21/1987', '3/8/1992'])
+        self.assertEqual(detect_date_format(us_dates), '%m/%d/%Y')
+        self.assertEqual(detect_date_format(pd.Series(['1987-05-21', '1980-11-12'])), '%Y-%m-%d')
+        expected_dates = pd.to_datetime(['1987-05-21', '1980-11-12', '1987-05-21', '1992-03-08'])
+        self.assertListEqual(parse_birthdates(us_dates).tolist(), expected_dates.tolist())
+        self.assertListEqual(parse_birthdates(us_dates.astype('category')).tolist(), expected_dates.tolist())
+        
+        # A column without any birthdate parses to NaT instead of failing
+        self.assertTrue(parse_birthdates(pd.Series([None, None], dtype=object)).isna().all())
+        self.assertTrue(parse_birthdates(pd.Series([None, None], dtype='category')).isna().all())
+        
+        # Rows with a date that does not match the format are reported instead of silently dropped
+        raw_df = self.df.copy()
+        raw_df['Birthdate'] = ['12/23/1902', '11/12/1980', '13/45/1991', '7/19/1984', '8/30/1982']
+        with self.assertLogs('passenger_analysis', level='WARNING'):
+            cleaned_df, rejected_df = clean_data(raw_df, return_rejected=True)
+        self.assertListEqual(rejected_df['PassengerID'].tolist(), [3323])
+        self.assertListEqual(cleaned_df['PassengerID'].tolist(), [3321, 3322, 3324, 3325])
+        logging.info("parse_birthdates function and clean_data rejected rows test passed.")
+
+    def test_validate_passengers(self):
+        """
+        Test that every validation rule quarantines its rows and is counted in the rejection summary.
+        """
+        logging.info("Testing validate_passengers function and clean_data quarantine...")
+        raw_df = pd.DataFrame({
+            'PassengerID': [1, 2, 2, -4, 5, 6, 7, 8, 9, 10],
+            'Name': ['Ann Lee', 'Bo Kim', 'Cy Hill', 'Di Ross', 'Ed Brown', None, 'Fay Wong', 'Gus Silva', 'Hal Doe', 'Ivy Garcia'],
+            'Birthdate': ['1/2/1980', '3/4/1985', '5/6/1990', '7/8/1975', '13/45/1991', '2/2/1960', '3/3/1850',
+                          '4/4/1970', '5/5/1965', '6/6/1999'],
+            'TravelClass': ['ECONOMY', 'BUSINESS', 'ECONOMY', 'FIRST_CLASS', 'ECONOMY', 'ECONOMY', 'BUSINESS',
+                            'COACH', 'ECONOMY', 'ECONOMY'],
+            'LoyaltyMember': ['TRUE', 'false', 'TRUE', 'FALSE', 'TRUE', 'TRUE', 'FALSE', 'TRUE', 'TRUE', 'maybe'],
+            'FlightNumber': ['BA249', 'AA100', 'UA100', 'LA249', 'BA249', 'AA100', 'BA255', 'AA110', 'flight 9', 'UA100'],
+        }).astype({'Birthdate': 'category', 'TravelClass': 'category', 'LoyaltyMember': 'category'})
+        original_df = raw_df.copy()
+        
+        # One row breaks each rule; rows 1 and 2 are valid (the second use of ID 2 is the duplicate)
+        summary, quarantine_df = validate_passengers(raw_df, travel_classes=TRAVEL_CLASSES)
+        self.assertListEqual(summary.index.tolist(), list(VALIDATION_RULES))
+        self.assertTrue((summary['Rows'] == 1).all())
+        self.assertListEqual(quarantine_df['RejectedRules'].tolist(), [
+            'duplicate_passenger_id', 'invalid_passenger_id', 'unparseable_birthdate', 'missing_value',
+            'birthdate_out_of_range', 'unknown_travel_class', 'invalid_flight_number', 'invalid_loyalty_flag'])
+        
+        # clean_data keeps the valid rows, returns the same quarantine and leaves its input untouched
+        with self.assertLogs('passenger_analysis', level='WARNING'):
+            cleaned_df, rejected_df = clean_data(raw_df, return_rejected=True, travel_classes=TRAVEL_CLASSES)
+        self.assertListEqual(cleaned_df['PassengerID'].tolist(), [1, 2])
+        self.assertListEqual(cleaned_df['LoyaltyMember'].tolist(), [True, False])
+        self.assertListEqual(cleaned_df['TravelClass'].cat.categories.tolist(), ['BUSINESS', 'ECONOMY'])
+        pd.testing.assert_frame_equal(rejected_df, quarantine_df)
+        pd.testing.assert_frame_equal(raw_df, original_df)
+        
+        # By default any travel class is accepted, which lets the 'COACH' passenger through
+        self.assertIn(8, clean_data(raw_df)['PassengerID'].tolist())
+        
+        # Malformed IDs in a CSV file are loaded and quarantined instead of failing the load
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'passengers.csv')
+            with open(file_path, 'w') as file:
+                file.write("3\n1,Ann Lee,1/2/1980,ECONOMY,TRUE,BA249\n"
+                           "abc,Bo Kim,3/4/1985,BUSINESS,FALSE,AA100\n4.5,Cy Hill,5/6/1990,ECONOMY,TRUE,UA100\n")
+            with self.assertLogs('passenger_analysis', level='WARNING'):
+                cleaned_df, rejected_df = clean_data(load_data(file_path), return_rejected=True)
+        self.assertListEqual(cleaned_df['PassengerID'].tolist(), [1])
+        self.assertEqual(cleaned_df['PassengerID'].dtype, 'int64')
+        self.assertListEqual(rejected_df['PassengerID'].tolist(), ['abc', '4.5'])
+        self.assertListEqual(rejected_df['RejectedRules'].tolist(), ['invalid_passenger_id', 'invalid_passenger_id'])
+        logging.info("validate_passengers function and clean_data quarantine test passed.")
+
     def test_calculate_average_age(self):
         """
         Test the calculate_average_age function to ensure it calculates the correct average age for a travel class.
@@ -89,6 +362,64 @@ class TestPassengerAnalysis(unittest.TestCase):
         self.assertEqual(actual_avg_age, expected_avg_age)
         logging.info("calculate_average_age function test passed.")
 
+    def test_passenger_ages(self):
+        """
+        Test that passenger_ages is reproducible for a fixed reference date, supports exact ages and is computed once.
+        """
+        logging.info("Testing passenger_ages function...")
+        
+        # Year-based ages only depend on the year of the reference date
+        ages = passenger_ages(self.df, reference_date=date(2024, 1, 1))
+        self.assertListEqual(ages.tolist(), [122, 44, 33, 40, 42])
+        
+        # Exact ages count only completed years
+        exact_ages = passenger_ages(self.df, reference_date=date(2024, 8, 30), exact=True)
+        self.assertListEqual(exact_ages.tolist(), [121, 43, 33, 40, 42])
+        
+        # Repeated calls return the cached ages and leave the DataFrame unchanged
+        self.assertIs(passenger_ages(self.df, reference_date=date(2024, 1, 1)), ages)
+        self.assertNotIn('Age', self.df.columns)
+        
+        # Functions accept the same reference date
+        self.assertEqual(calculate_average_age(self.df, 'FIRST_CLASS', reference_date=date(2024, 1, 1)), 82.0)
+        
+        # Editing the birth years in place invalidates the cached ages
+        df = clean_data(self.df)
+        self.assertEqual(calculate_average_age(df, 'ECONOMY', reference_date=date(2024, 1, 1)), 36.5)
+        df.loc[df['TravelClass'] == 'ECONOMY', 'BirthYear'] = 2000
+        self.assertEqual(calculate_average_age(df, 'ECONOMY', reference_date=date(2024, 1, 1)), 24.0)
+        self.assertListEqual(passenger_ages(df, reference_date=date(2024, 8, 30), exact=True).tolist(), [121, 43, 24, 24, 42])
+        df['Birthdate'] = df['Birthdate'] + pd.offsets.YearEnd(0)  # every birthday moves to December 31
+        self.assertListEqual(passenger_ages(df, reference_date=date(2024, 8, 30), exact=True).tolist(), [121, 43, 23, 23, 41])
+        logging.info("passenger_ages function test passed.")
+
+    def test_analysis_leaves_input_unchanged(self):
+        """
+        Test that the analysis and plotting functions never modify their input and derive ages without copying the data.
+        """
+        logging.info("Testing that the analysis leaves its input unchanged...")
+        df = clean_data(self.df)
+        snapshot = df.copy()
+        reference_date = date(2024, 1, 1)
+        
+        # The age view holds the same arrays as the DataFrame and the shared ages
+        ages = age_view(df, ['TravelClass', 'LoyaltyMember'], reference_date)
+        self.assertListEqual(list(ages.columns), ['Age', 'TravelClass', 'LoyaltyMember'])
+        self.assertTrue(np.shares_memory(ages['Age'].to_numpy(), passenger_ages(df, reference_date).to_numpy()))
+        self.assertTrue(np.shares_memory(ages['LoyaltyMember'].to_numpy(), df['LoyaltyMember'].to_numpy()))
+        self.assertTrue(np.shares_memory(ages['TravelClass'].array.codes, df['TravelClass'].array.codes))
+        
+        # Run the statistics and the Matplotlib charts over the same DataFrame
+        calculate_average_age(df, 'ECONOMY', reference_date)
+        get_class_statistics(df, list(CLASS_METRICS), reference_date)
+        aggregate_class_metrics(df, reference_date=reference_date)
+        for plot in [plot_age_distribution, plot_average_age_by_class, plot_age_vs_loyalty, plot_correlation_heatmap, plot_class_age_heatmap]:
+            plot(df, reference_date=reference_date, show=False, as_bytes=True)
+        
+        # Neither the values nor the columns of the DataFrame changed
+        pd.testing.assert_frame_equal(df, snapshot)
+        logging.info("Analysis input test passed.")
+
     def test_find_loyalty_members(self):
         """
         Test the find_loyalty_members function to ensure it returns the correct list of loyalty members.
@@ -131,6 +462,418 @@ class TestPassengerAnalysis(unittest.TestCase):
         self.assertEqual(stats['ECONOMY']['Loyalty Members'], 1)
         logging.info("get_class_statistics function test passed.")
 
+    def test_get_class_statistics_metrics(self):
+        """
+        Test that get_class_statistics computes additional per-class metrics and rejects unknown ones.
+        """
+        logging.info("Testing get_class_statistics function with extra metrics...")
+        
+        # Request every available metric in one pass
+        stats = get_class_statistics(self.df, metrics=list(CLASS_METRICS))
+        
+        # Verify the extra metrics for the 'FIRST_CLASS' travel class
+        current_year = datetime.now().year
+        first_class_ages = current_year - self.df[self.df['TravelClass'] == 'FIRST_CLASS']['Birthdate'].dt.year
+        self.assertEqual(stats['FIRST_CLASS']['Passengers'], 2)
+        self.assertEqual(stats['FIRST_CLASS']['Min Age'], first_class_ages.min())
+        self.assertEqual(stats['FIRST_CLASS']['Max Age'], first_class_ages.max())
+        self.assertEqual(stats['FIRST_CLASS']['Loyalty Share'], 1.0)
+        self.assertEqual(stats['ECONOMY']['Loyalty Share'], 0.5)
+        
+        # Verify that an unknown metric raises an error
+        with self.assertRaises(ValueError):
+            get_class_statistics(self.df, metrics=['Average Height'])
+        logging.info("get_class_statistics function test with extra metrics passed.")
+
+    def test_passenger_index(self):
+        """
+        Test that PassengerIndex answers flight, class and passenger ID queries like the full DataFrame scans.
+        """
+        logging.info("Testing PassengerIndex class...")
+        index = PassengerIndex(self.df)
+        
+        # Per-class, per-flight and per-flight/class queries
+        self.assertEqual(index.average_age(travel_class='ECONOMY'), calculate_average_age(self.df, 'ECONOMY'))
+        self.assertListEqual(index.loyalty_members(travel_class='FIRST_CLASS'), ['Jose Abel', 'Sully Tam'])
+        self.assertListEqual(index.loyalty_members(flight='BA249'), ['Sully Tam'])
+        self.assertEqual(index.count(flight='UA100', travel_class='BUSINESS'), 1)
+        self.assertEqual(index.count(flight='UA100', travel_class='ECONOMY'), 0)
+        self.assertListEqual(index.loyalty_members(), find_loyalty_members(self.df))
+        
+        # Passenger ID lookups
+        self.assertEqual(index.passenger(3323)['Name'], 'Pat Wong')
+        with self.assertRaises(KeyError):
+            index.passenger(9999)
+        logging.info("PassengerIndex class test passed.")
+
+    def test_partitioned_statistics(self):
+        """
+        Test the per-day, per-week and rolling-window statistics and their incremental computation from daily manifests.
+        """
+        logging.info("Testing the date-partitioned statistics...")
+        # Two passengers travel on Monday 2024-01-01, three on Tuesday
+        df = self.df.assign(TravelDate=pd.to_datetime(['2024-01-01', '2024-01-01', '2024-01-02', '2024-01-02', '2024-01-02']))
+        daily = get_class_statistics(df, TREND_METRICS, partition='D')
+        self.assertListEqual(list(daily), ['2024-01-01', '2024-01-02'])
+        self.assertDictEqual(daily['2024-01-01']['FIRST_CLASS'], {'Average Age': 122.0, 'Loyalty Members': 1, 'Passengers': 1,
+                                                                 'Loyalty Share': 1.0, 'Flights': 1, 'Flight Load': 1.0})
+        self.assertDictEqual(daily['2024-01-02']['ECONOMY'], {'Average Age': 36.5, 'Loyalty Members': 1, 'Passengers': 2,
+                                                              'Loyalty Share': 0.5, 'Flights': 2, 'Flight Load': 1.0})
+        
+        # A two-day window adds up both days; weekly partitions start on Monday
+        rolling = get_class_statistics(df, ['Passengers', 'Average Age'], partition='D', window=2)
+        self.assertDictEqual(rolling['2024-01-02']['FIRST_CLASS'], {'Passengers': 2, 'Average Age': 82.0})
+        weekly = get_class_statistics(df, ['Passengers', 'Flights'], partition='W')
+        self.assertDictEqual(weekly, {'2024-01-01': {'FIRST_CLASS': {'Passengers': 2, 'Flights': 2}, 'BUSINESS': {'Passengers': 1, 'Flights': 1},
+                                                     'ECONOMY': {'Passengers': 2, 'Flights': 2}}})
+        
+        # Adding a day only updates its partition and gives the same trend as a recomputation
+        partitioned = PartitionedStatistics().add(df.iloc[:2])
+        partitioned.add(df.iloc[2:])
+        self.assertDictEqual(get_class_statistics(partitioned, TREND_METRICS), daily)
+        with self.assertRaises(ValueError):
+            get_class_statistics(self.df, partition='D')
+        with self.assertRaises(ValueError):
+            get_class_statistics(df, ['Median Age'], partition='D')
+        with self.assertRaises(ValueError):
+            get_class_statistics(PassengerSketch(), partition='D')
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Daily manifests carry their travel date in the file name
+            for travel_date, day_df in df.groupby('TravelDate'):
+                write_raw_manifest(day_df.drop(columns='TravelDate'), os.path.join(tmp_dir, f'{travel_date.date()}.csv'))
+            self.assertEqual(travel_date_from_path(os.path.join(tmp_dir, '20240102.csv')), date(2024, 1, 2))
+            loaded_df = load_data(os.path.join(tmp_dir, '2024-01-02.csv'), travel_date='auto')
+            self.assertTrue((loaded_df['TravelDate'] == pd.Timestamp('2024-01-02')).all())
+            self.assertDictEqual(get_class_statistics(load_many(tmp_dir, processes=1, travel_dates=True), TREND_METRICS, partition='D'), daily)
+            
+            # With a result cache, a new day's manifest is the only file hashed and summarized again
+            # (each file has one cached hash, looked up by size and modification time, and one cached summary)
+            cache = ResultCache(os.path.join(tmp_dir, 'cache'))
+            summarize_partitions(tmp_dir, processes=1, cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (0, 4))
+            write_raw_manifest(self.df.iloc[:1], os.path.join(tmp_dir, '2024-01-03.csv'))
+            partitioned = summarize_partitions(tmp_dir, processes=1, cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (4, 6))
+            
+            # A file touched without changing its content is hashed again but keeps its summary
+            os.utime(os.path.join(tmp_dir, '2024-01-01.csv'), ns=(0, 0))
+            summarize_partitions(tmp_dir, processes=1, cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (9, 7))
+            self.assertDictEqual({day: statistics for day, statistics in partitioned.class_statistics(TREND_METRICS).items()
+                                  if day != '2024-01-03'}, daily)
+        logging.info("Date-partitioned statistics test passed.")
+
+    def test_iter_clean_data(self):
+        """
+        Test that iter_clean_data and summarize_chunks give the same results as the in-memory functions.
+        """
+        logging.info("Testing iter_clean_data and summarize_chunks functions...")
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'passengers.csv')
+            write_raw_manifest(self.df, file_path)
+            
+            # Every chunk must respect the requested size
+            chunks = list(iter_clean_data(file_path, chunksize=2))
+            self.assertListEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+            
+            stats, loyalty_count, class_flight_pivot = summarize_chunks(iter_clean_data(file_path, chunksize=2))
+            
+            # A chunk whose birthdates are all blank is quarantined as missing values instead of failing the stream
+            blank_path = os.path.join(tmp_dir, 'blank_birthdates.csv')
+            with open(file_path) as source, open(blank_path, 'w') as target:
+                for line_number, line in enumerate(source):
+                    if line_number in (3, 4):
+                        fields = line.split(',')
+                        fields[2] = ''
+                        line = ','.join(fields)
+                    target.write(line)
+            with self.assertLogs('passenger_analysis', level='WARNING') as logs:
+                blank_chunks = list(iter_clean_data(blank_path, chunksize=2))
+            self.assertListEqual([len(chunk) for chunk in blank_chunks], [2, 0, 1])
+            self.assertIn('missing_value', '\n'.join(logs.output))
+        
+        # Verify the streamed results against the in-memory results
+        expected_stats = get_class_statistics(self.df)
+        for travel_class, expected in expected_stats.items():
+            self.assertAlmostEqual(stats[travel_class]['Average Age'], expected['Average Age'])
+            self.assertEqual(stats[travel_class]['Loyalty Members'], expected['Loyalty Members'])
+        self.assertEqual(loyalty_count, len(find_loyalty_members(self.df)))
+        expected_pivot = self.df.pivot_table(index='FlightNumber', columns='TravelClass', aggfunc='size', fill_value=0)
+        pd.testing.assert_frame_equal(class_flight_pivot, expected_pivot)
+        logging.info("iter_clean_data and summarize_chunks function test passed.")
+
+    def test_instrumentation(self):
+        """
+        Test that enabled instrumentation records every stage and that disabled instrumentation records nothing.
+        """
+        logging.info("Testing enable_instrumentation function...")
+        records = []
+        enable_instrumentation(records.append, trace_memory=True)
+        try:
+            get_class_statistics(self.df)
+            with self.assertRaises(ValueError):
+                get_class_statistics(self.df, metrics=['Average Height'])
+        finally:
+            disable_instrumentation()
+        find_loyalty_members(self.df)
+        
+        # Nested stages are recorded innermost first, failures are recorded with their error
+        self.assertListEqual([record['stage'] for record in records],
+                             ['aggregate_class_metrics', 'get_class_statistics', 'aggregate_class_metrics', 'get_class_statistics'])
+        record = records[1]
+        self.assertEqual(record['rows_in'], 5)
+        self.assertEqual(record['rows_out'], 3)
+        self.assertGreater(record['wall_seconds'], 0)
+        self.assertGreater(record['peak_memory_bytes'], 0)
+        self.assertIsNone(record['error'])
+        self.assertIn('Average Height', records[3]['error'])
+        logging.info("enable_instrumentation function test passed.")
+
+    def test_lazy_plotting_import(self):
+        """
+        Test that importing passenger_analysis for analysis only does not load the plotting libraries.
+        """
+        logging.info("Testing lazy import of the plotting libraries...")
+        code = ("import sys, passenger_analysis; "
+                "print(sorted(m for m in ('matplotlib', 'seaborn', 'plotly') if m in sys.modules))")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.stdout.strip(), '[]')
+        logging.info("Lazy plotting import test passed.")
+
+    def test_render_charts(self):
+        """
+        Test that render_charts writes the Matplotlib charts to disk in worker processes without showing them.
+        """
+        logging.info("Testing render_charts function...")
+        # Plotly charts need the Kaleido renderer, so only the Matplotlib charts are rendered here
+        charts = [chart for chart in CHARTS if chart not in PLOTLY_CHARTS]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            chart_paths = render_charts(self.df, output_dir=tmp_dir, charts=charts, processes=2)
+            
+            # Every chart must be written as a non-empty PNG file
+            self.assertListEqual(list(chart_paths), charts)
+            for chart, chart_path in chart_paths.items():
+                self.assertEqual(chart_path, os.path.join(tmp_dir, f'{chart}.png'))
+                self.assertGreater(os.path.getsize(chart_path), 0)
+        
+        # Verify that an unknown chart raises an error
+        with self.assertRaises(ValueError):
+            render_charts(self.df, charts=['seat_map'])
+        logging.info("render_charts function test passed.")
+
+    def test_plot_output(self):
+        """
+        Test that a plot can be returned as in-memory bytes or written to a caller-supplied path or stream.
+        """
+        logging.info("Testing plot output options...")
+        png_signature = b'\x89PNG'
+        
+        # Encoded image returned in memory
+        image = plot_age_distribution(self.df, show=False, as_bytes=True)
+        self.assertTrue(image.startswith(png_signature))
+        
+        # Image written to a caller-supplied stream, in the requested format
+        stream = io.BytesIO()
+        plot_age_distribution(self.df, output=stream, show=False, image_format='svg')
+        self.assertIn(b'<svg', stream.getvalue())
+        
+        # Image written to a caller-supplied path
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'ages.png')
+            plot_age_distribution(self.df, output=file_path, show=False)
+            with open(file_path, 'rb') as file:
+                self.assertTrue(file.read().startswith(png_signature))
+        
+        # Batch rendering straight to memory
+        images = render_charts(self.df, charts=['age_distribution', 'travel_class_distribution'], processes=1, as_bytes=True)
+        self.assertTrue(all(image.startswith(png_signature) for image in images.values()))
+        logging.info("plot output options test passed.")
+
+    def test_result_cache(self):
+        """
+        Test that statistics, pivots and charts are reused for the same data and inputs, and that the cache evicts the least recently used results.
+        """
+        logging.info("Testing the result cache...")
+        reference_date = date(2024, 1, 1)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResultCache(tmp_dir)
+            
+            # The second identical call is answered from the cache with the same statistics
+            expected_stats = get_class_statistics(self.df, reference_date=reference_date)
+            self.assertDictEqual(cached_call(cache, get_class_statistics, self.df, reference_date=reference_date), expected_stats)
+            self.assertDictEqual(cached_call(cache, get_class_statistics, self.df, reference_date=reference_date), expected_stats)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            
+            # Another reference date or changed data is computed again
+            cached_call(cache, get_class_statistics, self.df, reference_date=date(2025, 1, 1))
+            changed_df = self.df.assign(LoyaltyMember=~self.df['LoyaltyMember'])
+            self.assertNotEqual(dataset_fingerprint(changed_df), dataset_fingerprint(self.df))
+            cached_call(cache, get_class_statistics, changed_df, reference_date=reference_date)
+            self.assertEqual((cache.hits, cache.misses), (1, 3))
+            
+            # Editing the DataFrame in place changes its fingerprint, so the statistics are computed again
+            edited_df = self.df.copy()
+            cached_call(cache, get_class_statistics, edited_df, reference_date=reference_date)
+            fingerprint = dataset_fingerprint(edited_df)
+            edited_df.loc[:, 'LoyaltyMember'] = False
+            self.assertNotEqual(dataset_fingerprint(edited_df), fingerprint)
+            edited_stats = cached_call(cache, get_class_statistics, edited_df, reference_date=reference_date)
+            self.assertTrue(all(stats['Loyalty Members'] == 0 for stats in edited_stats.values()))
+            self.assertEqual((cache.hits, cache.misses), (2, 4))
+            
+            # Pivots come back as the same table, with the same types whether they were cached or computed
+            pivot = cached_call(cache, class_flight_pivot, self.df)
+            pd.testing.assert_frame_equal(cached_call(cache, class_flight_pivot, self.df), pivot)
+            self.assertListEqual(pivot.to_numpy().tolist(), class_flight_pivot(self.df).to_numpy().tolist())
+            self.assertIs(type(cached_call(cache, calculate_average_age, self.df, travel_class='ECONOMY',
+                                           reference_date=reference_date)), float)
+            
+            # Only the charts that depend on the changed reference date are rendered again
+            charts = ['travel_class_distribution', 'average_age_by_class']
+            images = render_charts(self.df, charts=charts, processes=1, reference_date=reference_date, as_bytes=True, cache=cache)
+            hits, misses = cache.hits, cache.misses
+            self.assertDictEqual(render_charts(self.df, charts=charts, processes=1, reference_date=reference_date, as_bytes=True, cache=cache), images)
+            render_charts(self.df, charts=charts, processes=1, reference_date=date(2025, 1, 1), as_bytes=True, cache=cache)
+            self.assertEqual((cache.hits - hits, cache.misses - misses), (3, 1))
+            
+            # Beyond max_bytes the least recently used result is evicted
+            small_cache = ResultCache(os.path.join(tmp_dir, 'small'), max_bytes=250)
+            for name in ['a', 'b']:
+                small_cache.put(name, b'x' * 100)
+            small_cache.get('a')
+            small_cache.put('c', b'x' * 100)
+            self.assertIsNone(small_cache.get('b'))
+            self.assertIsNotNone(small_cache.get('a'))
+            self.assertLessEqual(small_cache.size, 250)
+        logging.info("Result cache test passed.")
+
+    def test_command_line(self):
+        """
+        Test that the command line runs only the requested stages and writes the statistics as JSON or CSV.
+        """
+        logging.info("Testing the command line entry point...")
+        reference_date = date(2024, 6, 1)
+        expected_stats = get_class_statistics(self.df, reference_date=reference_date)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'passengers.csv')
+            write_raw_manifest(self.df, file_path)
+            stats_path = os.path.join(tmp_dir, 'stats.json')
+            
+            # Stats only: no cleaned CSV and no charts are written
+            run_command_line([file_path, '--stages', 'stats', '--format', 'json', '--output', stats_path, '--no-cache',
+                              '--reference-date', '2024-06-01', '--output-dir', tmp_dir])
+            with open(stats_path) as file:
+                statistics = json.load(file)
+            self.assertDictEqual(statistics['class_statistics'], expected_stats)
+            self.assertEqual(statistics['loyalty_member_count'], 3)
+            self.assertListEqual(sorted(os.listdir(tmp_dir)), ['passengers.csv', 'stats.json'])
+            
+            # The streaming mode gives the same per-class table as CSV
+            csv_path = os.path.join(tmp_dir, 'stats.csv')
+            run_command_line([file_path, '--stream', '--format', 'csv', '--output', csv_path, '--reference-date', '2024-06-01'])
+            class_table = pd.read_csv(csv_path, index_col='TravelClass')
+            self.assertDictEqual(class_table.to_dict(orient='index'), expected_stats)
+            
+            # Fare classes other than the bundled ones survive the command line path
+            fare_df = self.df.astype({'TravelClass': str})
+            fare_df.loc[fare_df.index[0], 'TravelClass'] = 'FARE_004'
+            write_raw_manifest(fare_df, file_path)
+            run_command_line([file_path, '--stages', 'stats', '--format', 'json', '--output', stats_path, '--no-cache',
+                              '--reference-date', '2024-06-01'])
+            with open(stats_path) as file:
+                statistics = json.load(file)
+            self.assertSetEqual(set(statistics['class_statistics']), set(expected_stats) | {'FARE_004'})
+        logging.info("Command line entry point test passed.")
+
+    def test_passenger_service(self):
+        """
+        Test the JSON endpoints of the HTTP service, its response cache and its reload when the file changes.
+        """
+        logging.info("Testing PassengerService endpoints...")
+        
+        async def get(port, target):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+            response = await reader.read()
+            writer.close()
+            head, _, body = response.partition(b'\r\n\r\n')
+            return int(head.split()[1]), json.loads(body)
+        
+        async def scenario(file_path):
+            service = PassengerService(file_path, poll_interval=60)
+            await service.load()
+            server = await asyncio.start_server(service.handle_connection, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                results = {
+                    'stats': await get(port, '/class-statistics?reference_date=2024-06-01'),
+                    'cached_stats': await get(port, '/class-statistics?reference_date=2024-06-01'),
+                    'average_age': await get(port, '/average-age?travel_class=ECONOMY&reference_date=2024-06-01'),
+                    'members': await get(port, '/loyalty-members'),
+                    'pivot': await get(port, '/flight-class-pivot'),
+                    'bad_metric': await get(port, '/class-statistics?metrics=Bogus'),
+                    'unknown': await get(port, '/unknown'),
+                }
+                cached_responses = len(service._responses)
+                
+                # Parameters the endpoint does not read share the cached response; beyond max_responses the
+                # least recently used response is evicted
+                results['busted_stats'] = await get(port, '/class-statistics?reference_date=2024-06-01&_=123')
+                service.max_responses = 2
+                await get(port, '/average-age?travel_class=BUSINESS')
+                evicted_cache = list(service._responses)
+                
+                # Rewrite the file with fewer passengers; the next check reloads it and clears the cache
+                write_raw_manifest(self.df.iloc[:2], file_path)
+                os.utime(file_path, ns=(0, 0))
+                results['reloaded'] = await service.check_for_changes()
+                results['health'] = await get(port, '/health')
+            return results, cached_responses, evicted_cache
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'passengers.csv')
+            write_raw_manifest(self.df, file_path)
+            results, cached_responses, evicted_cache = asyncio.run(scenario(file_path))
+        
+        reference_date = date(2024, 6, 1)
+        self.assertEqual(results['stats'], (200, get_class_statistics(self.df, reference_date=reference_date)))
+        self.assertEqual(results['cached_stats'], results['stats'])
+        self.assertEqual(results['average_age'][1]['average_age'], calculate_average_age(self.df, 'ECONOMY', reference_date))
+        self.assertEqual(results['members'], (200, find_loyalty_members(self.df)))
+        self.assertEqual(results['pivot'][1]['BA255'], {'BUSINESS': 0, 'ECONOMY': 1, 'FIRST_CLASS': 0})
+        self.assertEqual(results['bad_metric'][0], 400)
+        self.assertEqual(results['unknown'][0], 404)
+        self.assertEqual(cached_responses, 4)  # one per distinct successful query
+        self.assertEqual(results['busted_stats'], results['stats'])
+        self.assertListEqual([key[0] for key in evicted_cache], ['/class-statistics', '/average-age'])
+        self.assertTrue(results['reloaded'])
+        self.assertEqual(results['health'][1]['passengers'], 2)
+        logging.info("PassengerService endpoints test passed.")
+
+    def test_generate_manifest(self):
+        """
+        Test that the benchmark's synthetic manifests follow the passengers.csv format and the requested skew.
+        """
+        logging.info("Testing generate_manifest function...")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = generate_manifest(os.path.join(tmp_dir, 'manifest.csv'), 2_500, n_flights=20, n_classes=5,
+                                          loyalty_rate=0.0, flight_skew=2.0, chunk_rows=1_000)
+            cleaned_df = clean_data(load_data(file_path))
+        
+        # Every generated row must survive cleaning, with unique IDs and the requested classes
+        self.assertEqual(len(cleaned_df), 2_500)
+        self.assertTrue(cleaned_df['PassengerID'].is_unique)
+        self.assertSetEqual(set(cleaned_df['TravelClass'].astype(str)), {'FIRST_CLASS', 'BUSINESS', 'ECONOMY', 'FARE_004', 'FARE_005'})
+        self.assertFalse(cleaned_df['LoyaltyMember'].any())
+        
+        # With a strong skew the first flight is the busiest
+        flight_counts = cleaned_df['FlightNumber'].value_counts()
+        self.assertEqual(flight_counts.index[0], 'AA100')
+        logging.info("generate_manifest function test passed.")
+
 if __name__ == '__main__':
     # Run the tests
     test_runner = unittest.TextTestRunner()
@@ -140,7 +883,7 @@ if __name__ == '__main__':
     # Print explanation of the output
     print("\nExplanation of the Output:")
     print("1. Log Messages: These provide detailed information about the progress and results of each test.")
-    print("2. Dot Characters ('.'): Each dot represents a single test that has run. Since there are five tests, you see five dots.")
+    print("2. Dot Characters ('.'): Each dot represents a single test that has run, so you see one dot per test.")
     print("3. 'OK' Message: This indicates that all tests were successful. If any test were to fail, additional information about the failure would be provided.")
     print("4. Summary: Shows the total number of tests run and the total time taken, followed by 'OK' to indicate all tests passed.")
     